@@ -12,57 +12,33 @@ class PriceVolumeChart {
     
     init() {
         this.renderRangeButtons();
-        this.updateChartData(this.getDefaultRange());
+        this.setActiveRange(this.data.range || 'MAX', false);
     }
 
     renderRangeButtons() {
-        const dates = this.data.dates;
-        if (!dates || dates.length === 0) return;
-
-        const firstDate = new Date(dates[0]);
-        const lastDate = new Date(dates[dates.length - 1]);
-        const diffDays = Math.ceil((lastDate - firstDate) / (1000 * 60 * 60 * 24));
-        const diffMonths = diffDays / 30;
-        const diffYears = diffDays / 365;
-
-        this.ranges = [
-            { label: '1M', valid: diffMonths >= 1 },
-            { label: '6M', valid: diffMonths >= 6 },
-            { label: '1Y', valid: diffYears >= 1 },
-            { label: '3Y', valid: diffYears >= 3 },
-            { label: '5Y', valid: diffYears >= 5 },
-            { label: '10Y', valid: diffYears >= 10 },
-            { label: 'MAX', valid: true }
-        ];
+        const ranges = this.data.ranges || ['MAX'];
 
         const container = document.getElementById('chart-range-controls');
         if (!container) return;
         container.innerHTML = '';
 
-        this.ranges.forEach(range => {
-            if (!range.valid) return;
-
+        ranges.forEach(label => {
             const btn = document.createElement('button');
-            btn.textContent = range.label;
-            btn.dataset.range = range.label;
+            btn.textContent = label;
+            btn.dataset.range = label;
             btn.className =
                 'px-3 py-1 text-xs font-medium rounded-full transition-all ' +
                 'text-slate-600 hover:bg-amber-100/60';
 
             btn.addEventListener('click', () => {
-                this.setActiveRange(range.label);
+                this.setActiveRange(label);
             });
 
             container.appendChild(btn);
         });
     }
 
-    getDefaultRange() {
-        const valid = this.ranges.filter(r => r.valid && r.label !== 'MAX');
-        return valid.length ? valid[valid.length - 1].label : 'MAX';
-    }
-
-    setActiveRange(label) {
+    setActiveRange(label, fetchData = true) {
         const container = document.getElementById('chart-range-controls');
         Array.from(container.children).forEach(btn => {
             if (btn.dataset.range === label) {
@@ -82,51 +58,47 @@ class PriceVolumeChart {
             }
         });
 
-        this.updateChartData(label);
+        if (fetchData) {
+            this.updateChartData(label);
+        } else {
+            this.renderChart(this.data);
+        }
     }
 
-    getSlicedData(range) {
-        if (range === 'MAX') return this.data;
-
-        const lastDate = new Date(this.data.dates[this.data.dates.length - 1]);
-        const startDate = new Date(lastDate);
-
-        const map = {
-            '1M': () => startDate.setMonth(startDate.getMonth() - 1),
-            '6M': () => startDate.setMonth(startDate.getMonth() - 6),
-            '1Y': () => startDate.setFullYear(startDate.getFullYear() - 1),
-            '3Y': () => startDate.setFullYear(startDate.getFullYear() - 3),
-            '5Y': () => startDate.setFullYear(startDate.getFullYear() - 5),
-            '10Y': () => startDate.setFullYear(startDate.getFullYear() - 10)
-        };
-
-        map[range]?.();
-
-        const startIndex = this.data.dates.findIndex(
-            d => new Date(d) >= startDate
-        );
-
-        return {
-            dates: this.data.dates.slice(startIndex),
-            prices: this.data.prices.slice(startIndex),
-            volumes: this.data.volumes.slice(startIndex),
-            index_prices: this.data.index_prices ? this.data.index_prices.slice(startIndex) : []
-        };
+    async fetchSeries(range) {
+        // Series are downsampled server-side, so only a few hundred points
+        // ever cross the wire regardless of how much history there is.
+        const params = new URLSearchParams({
+            range: range,
+            points: isMobile ? 200 : 500
+        });
+        const response = await fetch(`${this.data.url}?${params}`, {
+            headers: { 'Accept': 'application/json' }
+        });
+        if (!response.ok) throw new Error(`Chart request failed: ${response.status}`);
+        return response.json();
     }
 
-    updateChartData(range) {
-        const sliced = this.getSlicedData(range);
+    async updateChartData(range) {
+        let series;
+        try {
+            series = await this.fetchSeries(range);
+        } catch (e) {
+            console.error('Chart update failed:', e);
+            return;
+        }
+        if (!series.has_data) return;
 
         if (this.chart) {
-            this.chart.data.labels = sliced.dates;
-            this.chart.data.datasets[0].data = sliced.volumes;
-            this.chart.data.datasets[1].data = sliced.prices;
+            this.chart.data.labels = series.dates;
+            this.chart.data.datasets[0].data = series.volumes;
+            this.chart.data.datasets[1].data = series.prices;
             if (this.chart.data.datasets[2]) {
-                this.chart.data.datasets[2].data = sliced.index_prices;
+                this.chart.data.datasets[2].data = series.index_prices;
             }
             this.chart.update();
         } else {
-            this.renderChart(sliced);
+            this.renderChart(series);
         }
     }
 
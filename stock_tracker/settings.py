@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -58,6 +59,9 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Chords (the daily snapshot fan-out) collect chunk results here
+CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+CELERY_RESULT_EXPIRES = 60 * 60 * 24
 
 
 MIDDLEWARE = [
@@ -108,6 +112,59 @@ DATABASES = {
 }
 
 
+# Cache
+# Page fragments are cached per company and invalidated by bumping a
+# per-company version on writes (see stocks.utils.company_cache). The cache
+# also holds the search index version, the history rate limit and the market
+# data circuit breaker, so it must be shared by the web and Celery processes:
+# Redis at CACHE_URL, by default database 1 of the REDIS_URL server. The test
+# suite swaps in LocMemCache (tests/conftest.py).
+
+CACHE_URL = os.environ.get("CACHE_URL") or urlsplit(CELERY_BROKER_URL)._replace(path="/1").geturl()
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_URL,
+    }
+}
+
+COMPANY_CACHE_TIMEOUT = int(os.environ.get("COMPANY_CACHE_TIMEOUT", 60 * 60 * 24))
+
+# Market data source: "yfinance", or "replay" to serve recorded fixtures from
+# MARKET_DATA_REPLAY_DIR (see stocks.utils.market_data)
+MARKET_DATA_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "yfinance")
+MARKET_DATA_REPLAY_DIR = Path(os.environ.get("MARKET_DATA_REPLAY_DIR", BASE_DIR / "data" / "replay"))
+
+# Circuit breaker around market data calls (stocks.utils.circuit_breaker):
+# opens for `cooldown` seconds once `error_rate` of at least `min_calls` calls
+# in the last one to two `window`s failed, doubling up to `max_cooldown` while
+# probes keep failing. Snapshot task retries wait about `backoff` * 2^attempt
+# seconds, longer as the error rate rises, up to `max_backoff`.
+MARKET_DATA_BREAKER = {
+    "window": 60,
+    "min_calls": int(os.environ.get("MARKET_DATA_BREAKER_MIN_CALLS", 20)),
+    "error_rate": float(os.environ.get("MARKET_DATA_BREAKER_ERROR_RATE", 0.5)),
+    "cooldown": int(os.environ.get("MARKET_DATA_BREAKER_COOLDOWN", 30)),
+    "max_cooldown": 600,
+    "backoff": 60,
+    "max_backoff": 1800,
+}
+
+# Memory-mapped companies x trading-days price matrix (stocks.utils.price_matrix)
+PRICE_MATRIX_DIR = Path(os.environ.get("PRICE_MATRIX_DIR", BASE_DIR / "data" / "price_matrix"))
+
+# get_all_histories: provider requests in flight, requests per second shared
+# by every process through the cache, and fetched frames buffered for the writer
+HISTORY_FETCH_WORKERS = int(os.environ.get("HISTORY_FETCH_WORKERS", 8))
+HISTORY_FETCH_RATE = int(os.environ.get("HISTORY_FETCH_RATE", 5))
+HISTORY_WRITE_QUEUE_SIZE = int(os.environ.get("HISTORY_WRITE_QUEUE_SIZE", 32))
+
+# Seconds a FinancialValue edit waits before its company's fundamentals are
+# recomputed; edits within the window are coalesced into one run.
+FUNDAMENTALS_RECOMPUTE_DELAY = int(os.environ.get("FUNDAMENTALS_RECOMPUTE_DELAY", 30))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -148,6 +205,11 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Admin uploads waiting for a Celery worker (stocks.utils.background_jobs).
+# Not served over HTTP; in production the web and worker containers must
+# share this directory (the media_volume in docker-compose.prod.yml).
+MEDIA_ROOT = Path(os.environ.get("MEDIA_ROOT", BASE_DIR / "media"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -162,6 +224,14 @@ CELERY_BEAT_SCHEDULE = {
         "task": "stocks.tasks.daily_market_snapshot",
         "schedule": crontab(hour=10, minute=30, day_of_week="1-5"),
     },
+    "failed-fetch-retry": {
+        "task": "stocks.tasks.retry_failed_fetches",
+        "schedule": crontab(hour="11-12", minute="*/15", day_of_week="1-5"),
+    },
+    "fundamentals-recompute": {
+        "task": "stocks.tasks.recompute_fundamentals",
+        "schedule": crontab(minute="*/15"),
+    },
     "weekly-market-update": {
         "task": "stocks.tasks.weekly_market_update",
         "schedule": crontab(hour=0, minute=30, day_of_week="0"),
@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stock_tracker.settings")
 
 application = get_wsgi_application()
+
+# Build the autocomplete index when the worker starts rather than on the
+# first keystroke. A missing or unmigrated database just defers it.
+from django.db import DatabaseError  # noqa: E402
+from stocks.utils.search_index import get_search_index  # noqa: E402
+
+try:
+    get_search_index()
+except DatabaseError:
+    pass
@@ -1,9 +1,8 @@
 # admin.py
 from django.contrib import admin
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-import os
-import tempfile
+from django.db import transaction
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import (
     Company,
     TimePeriod,
@@ -13,13 +12,29 @@ from .models import (
     CompanyFundamental,
     CompanyMarketSnapshot,
     CompanyHistory,
-    Index,IndexCategory,IndexHistory
+    Index,IndexCategory,IndexHistory,
+    BackgroundJob,
+    FailedFetch,
+    SnapshotRun,
 )
 from .forms import FinancialValueAdminForm, CompanyAdminForm
-from stocks.utils.import_excel import import_data_sheet
-from stocks.utils.marketsnapshot import get_live_snapshot,get_weekly_updates
-from stocks.utils.get_historical_data import get_history
-from stocks.utils.get_index_histories import get_index_history
+from stocks.tasks import run_background_job
+from stocks.utils.background_jobs import save_upload
+
+
+def start_background_job(admin_view, request, **fields):
+    """
+    Records a BackgroundJob and queues it once the admin save commits, so
+    the request returns immediately and the worker sees the saved object.
+    """
+    job = BackgroundJob.objects.create(**fields)
+    transaction.on_commit(lambda: run_background_job.delay(job.pk))
+    url = reverse("admin:stocks_backgroundjob_change", args=[job.pk])
+    admin_view.message_user(
+        request,
+        format_html('{} queued. <a href="{}">Follow its progress</a>.', job.get_kind_display(), url),
+    )
+    return job
 
 
 # admin.site.register(CompanyHistory)
@@ -36,26 +51,14 @@ class CompanyAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        get_live_snapshot(obj)
-        get_weekly_updates(obj)
-        get_history(obj)
         excel_file = form.cleaned_data.get("excel_file")
-
-
-        if excel_file:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-                for chunk in excel_file.chunks():
-                    tmp.write(chunk)
-                tmp_path = tmp.name
-
-            try:
-                import_data_sheet(
-                    file_path=tmp_path,
-                    company_ticker=obj.ticker
-                )
-
-            finally:
-                os.remove(tmp_path)
+        start_background_job(
+            self,
+            request,
+            kind="company_onboarding",
+            company=obj,
+            upload=save_upload(excel_file, obj.ticker) if excel_file else "",
+        )
 
 
 # admin.site.register(IndexHistory)
@@ -72,7 +75,7 @@ class IndexAdmin(admin.ModelAdmin):
     list_filter = ['name','ticker','exchange','category']
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        get_index_history(obj)
+        start_background_job(self, request, kind="index_history", index=obj)
 
 admin.site.register(IndexCategory)
 
@@ -118,3 +121,58 @@ class FinancialValueAdmin(admin.ModelAdmin):
     list_filter = ["company",  "time_period"]
     autocomplete_fields = ["company", "metric", "time_period"]
 
+
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ["kind", "company", "index", "status", "step", "progress_bar", "created_at", "finished_at"]
+    list_filter = ["kind", "status"]
+    readonly_fields = [
+        "kind", "company", "index", "status", "step", "progress_bar",
+        "upload", "error", "created_at", "started_at", "finished_at",
+    ]
+    exclude = ["progress"]
+
+    @admin.display(description="Progress")
+    def progress_bar(self, obj):
+        return format_html('<progress max="100" value="{}"></progress> {}%', obj.progress, obj.progress)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(FailedFetch)
+class FailedFetchAdmin(admin.ModelAdmin):
+    list_display = ["symbol", "kind", "attempts", "error", "first_failed_at", "last_failed_at"]
+    list_filter = ["kind"]
+    search_fields = ["symbol"]
+    readonly_fields = ["kind", "symbol", "company", "index", "error", "attempts", "first_failed_at", "last_failed_at"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SnapshotRun)
+class SnapshotRunAdmin(admin.ModelAdmin):
+    list_display = [
+        "started_at", "status", "duration", "companies_updated", "companies_failed",
+        "indices_updated", "indices_failed", "rows_written",
+    ]
+    list_filter = ["status"]
+    readonly_fields = [
+        "status", "chunks", "companies_updated", "companies_failed", "indices_updated",
+        "indices_failed", "rows_written", "error", "started_at", "finished_at", "duration",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
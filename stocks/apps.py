@@ -1,10 +1,29 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete, pre_delete
 
 class StocksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "stocks"
 
     def ready(self):
-        from .signals import create_metric_categories
+        from .signals import create_metric_categories, forget_cascaded_values, forget_import_fingerprints, invalidate_company_cache, mark_company_dirty, recompute_formula_metrics, refresh_search_index
         post_migrate.connect(create_metric_categories, sender=self)
+
+        for model_name in ("Company", "FinancialValue", "CompanyMarketSnapshot", "CompanyFundamental", "CompanyHistory"):
+            model = self.get_model(model_name)
+            post_save.connect(invalidate_company_cache, sender=model)
+            post_delete.connect(invalidate_company_cache, sender=model)
+
+        financial_value = self.get_model("FinancialValue")
+        post_save.connect(forget_import_fingerprints, sender=financial_value)
+        post_delete.connect(forget_import_fingerprints, sender=financial_value)
+        post_save.connect(mark_company_dirty, sender=financial_value)
+        post_delete.connect(mark_company_dirty, sender=financial_value)
+        for model_name in ("Metric", "TimePeriod"):
+            pre_delete.connect(forget_cascaded_values, sender=self.get_model(model_name))
+
+        post_save.connect(recompute_formula_metrics, sender=self.get_model("Metric"))
+
+        company = self.get_model("Company")
+        post_save.connect(refresh_search_index, sender=company)
+        post_delete.connect(refresh_search_index, sender=company)
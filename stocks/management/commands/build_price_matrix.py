@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from stocks.utils.price_matrix import build_price_matrix, load_price_matrix
+
+
+class Command(BaseCommand):
+    help = "Export closing prices and volumes into a memory-mapped companies x days matrix"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=str,
+            default=None,
+            help="Output directory (defaults to settings.PRICE_MATRIX_DIR)",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help=(
+                "Rebuild from scratch instead of re-reading only changed and new trading days; "
+                "needed after editing history older than the recheck window"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        days = build_price_matrix(path=options["path"], full=options["full"])
+        matrix = load_price_matrix(options["path"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Price matrix updated: {days} day(s) written, "
+                f"{len(matrix.tickers)} companies x {len(matrix.dates)} days"
+            )
+        )
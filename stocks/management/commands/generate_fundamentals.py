@@ -6,5 +6,5 @@ class Command(BaseCommand):
     help = "Generate company fundamentals from financial values"
 
     def handle(self, *args, **options):
-        generate_all_company_fundamentals()
-        self.stdout.write(self.style.SUCCESS("Company fundamentals generated successfully"))
+        count = generate_all_company_fundamentals()
+        self.stdout.write(self.style.SUCCESS(f"Company fundamentals generated successfully for {count} companies"))
@@ -1,21 +1,49 @@
-from stocks.utils.get_historical_data import get_history
-from stocks.utils.get_index_histories import get_index_history
+from stocks.utils.history_fetcher import fetch_histories, history_jobs
 from django.core.management.base import BaseCommand
-from stocks.models import Company, Index
 
 class Command(BaseCommand):
     help = "Gets all historical data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Refetch complete histories instead of only the missing tail",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Provider requests in flight (default: HISTORY_FETCH_WORKERS)",
+        )
+        parser.add_argument(
+            "--rate",
+            type=int,
+            default=None,
+            help="Provider requests per second across all processes, 0 for unlimited (default: HISTORY_FETCH_RATE)",
+        )
+        parser.add_argument(
+            "--queue-size",
+            type=int,
+            default=None,
+            help="Fetched histories buffered for the DB writer (default: HISTORY_WRITE_QUEUE_SIZE)",
+        )
+
     def handle(self,*args, **options):
-        companies = Company.objects.all()
-        for company in companies:
-            try:
-                get_history(company)
-            except Exception as e:
-                print(f"Failed for {company.ticker}: {e}")
-        indexes = Index.objects.all()
-        for index in indexes:
-            try:
-                get_index_history(index)
-            except Exception as e:
-                print(f"Failed for {index.ticker}: {e}")
+        jobs = history_jobs(full=options["full"])
+        self.stdout.write(f"Fetching {len(jobs)} histories...")
+        summary = fetch_histories(
+            jobs,
+            workers=options["workers"],
+            rate=options["rate"],
+            queue_size=options["queue_size"],
+        )
+
+        for symbol, error in sorted(summary["failed"].items()):
+            self.stderr.write(f"Failed for {symbol}: {error}")
+        self.stdout.write(
+            f"{summary['written']}/{summary['targets']} histories, {summary['rows']} rows "
+            f"in {summary['seconds']:.1f}s ({summary['targets_per_second']:.1f} histories/s, "
+            f"{summary['rows_per_second']:.0f} rows/s), {len(summary['failed'])} failed"
+        )
         self.stdout.write(self.style.SUCCESS("Histories fetched successfully"))
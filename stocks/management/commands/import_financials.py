@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand, CommandError
-from stocks.utils.import_excel import import_data_sheet
+from stocks.utils.import_excel import import_data_sheet, import_data_sheets
+import csv
 import os
+from pathlib import Path
 
 
 class Command(BaseCommand):
@@ -10,16 +12,49 @@ class Command(BaseCommand):
         parser.add_argument(
             "file_path",
             type=str,
+            nargs="?",
             help="Path to Excel file (e.g. data/SBI.xlsx)",
         )
         parser.add_argument(
             "company_ticker",
             type=str,
+            nargs="?",
             help="Company ticker (e.g. SBIN)",
         )
+        parser.add_argument(
+            "--dir",
+            type=str,
+            help="Bulk mode: import every <TICKER>.xlsx in this directory",
+        )
+        parser.add_argument(
+            "--manifest",
+            type=str,
+            help="Bulk mode: CSV file with file,ticker rows (relative paths are resolved against the manifest)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Bulk mode: parser processes (default: CPU count)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rewrite every section even if its content hash is unchanged",
+        )
+        parser.add_argument(
+            "--report",
+            type=str,
+            help="Bulk mode: write the per-file timing and error report to this CSV file",
+        )
 
     def handle(self, *args, **options):
+        if options["dir"] or options["manifest"]:
+            return self.handle_bulk(options)
+
         file_path = options["file_path"]
+        if not file_path or not options["company_ticker"]:
+            raise CommandError("Give file_path and company_ticker, or --dir/--manifest for a bulk import")
         company_ticker = options["company_ticker"].upper()
 
         if not os.path.exists(file_path):
@@ -31,6 +66,7 @@ class Command(BaseCommand):
             company = import_data_sheet(
                 file_path=file_path,
                 company_ticker=company_ticker,
+                force=options["force"],
             )
         except Exception as e:
             raise CommandError(str(e))
@@ -40,3 +76,55 @@ class Command(BaseCommand):
                 f"✔ Import completed successfully for {company.ticker}"
             )
         )
+
+    def bulk_jobs(self, options):
+        jobs = []
+        if options["dir"]:
+            directory = Path(options["dir"])
+            if not directory.is_dir():
+                raise CommandError(f"Directory not found: {directory}")
+            for path in sorted(directory.glob("*.xlsx")):
+                if not path.name.startswith("~$"):
+                    jobs.append((str(path), path.stem.upper()))
+
+        if options["manifest"]:
+            manifest = Path(options["manifest"])
+            if not manifest.exists():
+                raise CommandError(f"File not found: {manifest}")
+            with open(manifest, newline="") as f:
+                for row in csv.DictReader(f):
+                    path = Path(row["file"])
+                    if not path.is_absolute():
+                        path = manifest.parent / path
+                    jobs.append((str(path), row["ticker"].strip().upper()))
+        return jobs
+
+    def handle_bulk(self, options):
+        jobs = self.bulk_jobs(options)
+        if not jobs:
+            raise CommandError("No workbooks to import")
+
+        self.stdout.write(f"Importing {len(jobs)} workbooks...")
+        reports = import_data_sheets(jobs, workers=options["workers"], force=options["force"])
+
+        for report in sorted(reports, key=lambda r: r["file"]):
+            if report["status"] == "ok":
+                self.stdout.write(
+                    f"  {report['ticker']:<12} {report['values']:>6} values  "
+                    f"parse {report['parse_seconds']:.2f}s  write {report['write_seconds']:.2f}s"
+                )
+            else:
+                self.stdout.write(self.style.ERROR(f"  {report['ticker']:<12} {report['error']}"))
+
+        if options["report"]:
+            with open(options["report"], "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(reports[0]))
+                writer.writeheader()
+                writer.writerows(reports)
+
+        failed = sum(1 for r in reports if r["status"] != "ok")
+        summary = f"✔ Imported {len(reports) - failed} of {len(reports)} workbooks"
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{summary}, {failed} failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
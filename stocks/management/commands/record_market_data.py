@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from stocks.models import Company, Index
+from stocks.utils.market_data import ReplayProvider, YFinanceProvider
+
+
+class Command(BaseCommand):
+    help = "Record yfinance histories and info as replay fixtures"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "tickers",
+            nargs="*",
+            help="Company tickers to record (default: all companies and indices)",
+        )
+        parser.add_argument(
+            "--dir",
+            type=str,
+            default=None,
+            help="Replay directory (defaults to settings.MARKET_DATA_REPLAY_DIR)",
+        )
+
+    def handle(self, *args, **options):
+        source = YFinanceProvider()
+        replay = ReplayProvider(options["dir"] or settings.MARKET_DATA_REPLAY_DIR)
+
+        companies = Company.objects.all()
+        indexes = Index.objects.all()
+        if options["tickers"]:
+            companies = companies.filter(ticker__in=[t.upper() for t in options["tickers"]])
+            indexes = indexes.none()
+
+        symbols = [(f"{c.ticker}.NS", True) for c in companies]
+        symbols += [(i.metadata["yahoo_symbol"], False) for i in indexes if i.metadata.get("yahoo_symbol")]
+
+        recorded = 0
+        for symbol, with_info in symbols:
+            try:
+                replay.record(
+                    symbol,
+                    history=source.history(symbol),
+                    info=source.info(symbol) if with_info else None,
+                )
+                recorded += 1
+            except Exception as e:
+                self.stderr.write(f"Failed for {symbol}: {type(e).__name__}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Recorded {recorded}/{len(symbols)} symbols to {replay.root}"))
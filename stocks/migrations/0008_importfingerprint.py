@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0007_indexcategory_index_indexhistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=20, verbose_name='Section')),
+                ('digest', models.CharField(max_length=64, verbose_name='Digest')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_fingerprints', to='stocks.company', verbose_name='Company')),
+            ],
+            options={
+                'verbose_name': 'Import Fingerprint',
+                'verbose_name_plural': 'Import Fingerprints',
+                'unique_together': {('company', 'section')},
+            },
+        ),
+    ]
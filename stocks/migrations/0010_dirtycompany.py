@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0009_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyCompany',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dirty_fundamentals', serialize=False, to='stocks.company')),
+                ('marked_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Dirty Company',
+                'verbose_name_plural': 'Dirty Companies',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0010_dirtycompany'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyfundamental',
+            name='profit_cagr_10y',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='companyfundamental',
+            name='profit_cagr_3y',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='companyfundamental',
+            name='sales_cagr_10y',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='companyfundamental',
+            name='sales_cagr_3y',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+# Default ratios over the Data Sheet metric codes; more can be added in the admin
+RATIO_METRICS = [
+    ("OPM_PERCENT", "OPM %", "OPERATING_PROFIT / SALES * 100"),
+    ("NPM_PERCENT", "Net Profit Margin %", "NET_PROFIT / SALES * 100"),
+    ("ROE_PERCENT", "Return on Equity %", "NET_PROFIT / (EQUITY_SHARE_CAPITAL + RESERVES) * 100"),
+    ("DEBT_TO_EQUITY", "Debt to Equity", "BORROWINGS / (EQUITY_SHARE_CAPITAL + RESERVES)"),
+]
+
+
+def add_ratio_metrics(apps, schema_editor):
+    MetricCategory = apps.get_model("stocks", "MetricCategory")
+    Metric = apps.get_model("stocks", "Metric")
+    category, _ = MetricCategory.objects.get_or_create(code="RATIO")
+    for code, name, formula in RATIO_METRICS:
+        Metric.objects.get_or_create(code=code, defaults={"name": name, "category": category, "formula": formula})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0011_cagr_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='metriccategory',
+            name='code',
+            field=models.CharField(choices=[('PNL', 'Profit & Loss'), ('BS', 'Balance Sheet'), ('CF', 'Cash Flow'), ('RATIO', 'Ratios')], max_length=10, unique=True, verbose_name='Category Code'),
+        ),
+        migrations.RunPython(add_ratio_metrics, migrations.RunPython.noop),
+    ]
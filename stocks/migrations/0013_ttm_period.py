@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0012_ratio_category'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timeperiod',
+            name='period_type',
+            field=models.CharField(choices=[('annual', 'Annual'), ('quarterly', 'Quarterly'), ('ttm', 'Trailing Twelve Months')], max_length=10, verbose_name='Period Type'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0013_ttm_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialGrowth',
+            fields=[
+                ('financial_value', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='growth', serialize=False, to='stocks.financialvalue')),
+                ('yoy', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='YoY growth (%)')),
+                ('qoq', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='QoQ growth (%)')),
+            ],
+            options={
+                'verbose_name': 'Financial Growth',
+                'verbose_name_plural': 'Financial Growth',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0014_financialgrowth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedFetch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('company_snapshot', 'Company snapshot'), ('index_snapshot', 'Index snapshot')], max_length=30, verbose_name='Kind')),
+                ('symbol', models.CharField(max_length=30, verbose_name='Provider Symbol')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('attempts', models.PositiveIntegerField(default=1, verbose_name='Attempts')),
+                ('first_failed_at', models.DateTimeField(auto_now_add=True)),
+                ('last_failed_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='failed_fetches', to='stocks.company', verbose_name='Company')),
+                ('index', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='failed_fetches', to='stocks.index', verbose_name='Index')),
+            ],
+            options={
+                'verbose_name': 'Failed Fetch',
+                'verbose_name_plural': 'Failed Fetches',
+                'ordering': ['-last_failed_at'],
+                'unique_together': {('kind', 'symbol')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0015_failedfetch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], default='running', max_length=10, verbose_name='Status')),
+                ('chunks', models.PositiveIntegerField(default=0, verbose_name='Company Chunks')),
+                ('companies_updated', models.PositiveIntegerField(default=0, verbose_name='Companies Updated')),
+                ('companies_failed', models.PositiveIntegerField(default=0, verbose_name='Companies Failed')),
+                ('indices_updated', models.PositiveIntegerField(default=0, verbose_name='Indices Updated')),
+                ('indices_failed', models.PositiveIntegerField(default=0, verbose_name='Indices Failed')),
+                ('rows_written', models.PositiveIntegerField(default=0, verbose_name='Rows Written')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot Run',
+                'verbose_name_plural': 'Snapshot Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
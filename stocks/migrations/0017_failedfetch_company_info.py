@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0016_snapshotrun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='failedfetch',
+            name='kind',
+            field=models.CharField(choices=[('company_snapshot', 'Company snapshot'), ('index_snapshot', 'Index snapshot'), ('company_info', 'Company weekly info')], max_length=30, verbose_name='Kind'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0017_failedfetch_company_info'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='companyhistory',
+            index=models.Index(fields=['date'], name='stocks_comp_date_09b37e_idx'),
+        ),
+    ]
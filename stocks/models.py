@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
@@ -89,6 +90,7 @@ class TimePeriod(models.Model):
     PERIOD_TYPE_CHOICES = (
         ("annual", "Annual"),
         ("quarterly", "Quarterly"),
+        ("ttm", "Trailing Twelve Months"),
     )
 
     year = models.SmallIntegerField(_("Year"))
@@ -108,6 +110,8 @@ class TimePeriod(models.Model):
     def __str__(self):
         if self.period_type == "quarterly":
             return f"FY{self.year} Q{self.quarter}"
+        if self.period_type == "ttm":
+            return f"TTM FY{self.year} Q{self.quarter}"
         return f"FY{self.year} {self.period_type.upper()}"
 
 class MetricCategory(models.Model):
@@ -116,6 +120,7 @@ class MetricCategory(models.Model):
         ("PNL", "Profit & Loss"),
         ("BS", "Balance Sheet"),
         ("CF", "Cash Flow"),
+        ("RATIO", "Ratios"),
     )
 
     code = models.CharField(
@@ -154,6 +159,17 @@ class Metric(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        from stocks.utils.formulas import FormulaError, parse_formula
+
+        if self.formula:
+            try:
+                names = parse_formula(self.formula)[1]
+            except FormulaError as e:
+                raise ValidationError({"formula": str(e)})
+            if self.code in names:
+                raise ValidationError({"formula": _("A formula can't refer to its own metric.")})
+
 
 class FinancialValue(models.Model):
 
@@ -198,6 +214,29 @@ class FinancialValue(models.Model):
         return reverse("financialvalue_detail", kwargs={"pk": self.pk})
 
 
+class FinancialGrowth(models.Model):
+    """
+    Precomputed growth of a FinancialValue against the same metric one year
+    (and, for quarters, one quarter) earlier, in %.
+    """
+
+    financial_value = models.OneToOneField(
+        FinancialValue,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="growth",
+    )
+    yoy = models.DecimalField(_("YoY growth (%)"), max_digits=14, decimal_places=2, null=True, blank=True)
+    qoq = models.DecimalField(_("QoQ growth (%)"), max_digits=14, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Financial Growth")
+        verbose_name_plural = _("Financial Growth")
+
+    def __str__(self):
+        return f"{self.financial_value} | YoY {self.yoy} | QoQ {self.qoq}"
+
+
 class CompanyFundamental(models.Model):
 
     company = models.OneToOneField(
@@ -221,8 +260,12 @@ class CompanyFundamental(models.Model):
     debt_to_equity = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
 
     # Growth (% CAGR)
+    sales_cagr_3y = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     sales_cagr_5y = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    sales_cagr_10y = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    profit_cagr_3y = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     profit_cagr_5y = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    profit_cagr_10y = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
 
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -233,6 +276,27 @@ class CompanyFundamental(models.Model):
     def __str__(self):
         return f"{self.company.name} Fundamentals"
 
+class DirtyCompany(models.Model):
+    """
+    Company whose financial values changed since its CompanyFundamental was
+    last computed.
+    """
+
+    company = models.OneToOneField(
+        Company,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="dirty_fundamentals",
+    )
+    marked_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = _("Dirty Company")
+        verbose_name_plural = _("Dirty Companies")
+
+    def __str__(self):
+        return f"{self.company.ticker} | {self.marked_at}"
+
 class CompanyMarketSnapshot(models.Model):
 
     company = models.OneToOneField(
@@ -267,6 +331,8 @@ class CompanyHistory(models.Model):
         unique_together = ("company", "date")
         indexes = [
             models.Index(fields=["company", "date"]),
+            # Range scans over recent days, e.g. the price matrix refresh
+            models.Index(fields=["date"]),
         ]
 
     def __str__(self):
@@ -274,3 +340,168 @@ class CompanyHistory(models.Model):
 
     def get_absolute_url(self):
         return reverse("PriceHistory_detail", kwargs={"pk": self.pk})
+
+
+class ImportFingerprint(models.Model):
+    """
+    Content hash of one Data Sheet section as last imported for a company,
+    so re-imports can skip sections whose content hasn't changed.
+    """
+
+    company = models.ForeignKey(
+        Company,
+        verbose_name=_("Company"),
+        on_delete=models.CASCADE,
+        related_name="import_fingerprints",
+    )
+    section = models.CharField(_("Section"), max_length=20)
+    digest = models.CharField(_("Digest"), max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Import Fingerprint")
+        verbose_name_plural = _("Import Fingerprints")
+        unique_together = ("company", "section")
+
+    def __str__(self):
+        return f"{self.company.ticker} | {self.section}"
+
+
+class BackgroundJob(models.Model):
+    """
+    Status of a Celery job started from the admin, polled by the admin
+    progress page.
+    """
+
+    KIND_CHOICES = (
+        ("company_onboarding", "Company onboarding"),
+        ("index_history", "Index history"),
+    )
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    )
+
+    kind = models.CharField(_("Kind"), max_length=30, choices=KIND_CHOICES)
+    company = models.ForeignKey(
+        Company,
+        verbose_name=_("Company"),
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    index = models.ForeignKey(
+        Index,
+        verbose_name=_("Index"),
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default="pending")
+    step = models.CharField(_("Step"), max_length=50, blank=True)
+    progress = models.PositiveSmallIntegerField(_("Progress (%)"), default=0)
+    upload = models.CharField(_("Uploaded file"), max_length=255, blank=True)
+    error = models.TextField(_("Error"), blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Background Job")
+        verbose_name_plural = _("Background Jobs")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        target = self.company or self.index
+        return f"{self.get_kind_display()} | {target} | {self.status}"
+
+    @property
+    def is_active(self):
+        return self.status in ("pending", "running")
+
+
+class FailedFetch(models.Model):
+    """
+    A company or index whose market data fetch failed, kept until a later
+    fetch succeeds so a retry pass can target just these.
+    """
+
+    KIND_CHOICES = (
+        ("company_snapshot", "Company snapshot"),
+        ("index_snapshot", "Index snapshot"),
+        ("company_info", "Company weekly info"),
+    )
+
+    kind = models.CharField(_("Kind"), max_length=30, choices=KIND_CHOICES)
+    symbol = models.CharField(_("Provider Symbol"), max_length=30)
+    company = models.ForeignKey(
+        Company,
+        verbose_name=_("Company"),
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="failed_fetches",
+    )
+    index = models.ForeignKey(
+        Index,
+        verbose_name=_("Index"),
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="failed_fetches",
+    )
+    error = models.TextField(_("Error"), blank=True)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=1)
+    first_failed_at = models.DateTimeField(auto_now_add=True)
+    last_failed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Failed Fetch")
+        verbose_name_plural = _("Failed Fetches")
+        unique_together = ("kind", "symbol")
+        ordering = ["-last_failed_at"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} | {self.symbol} | {self.attempts}"
+
+
+class SnapshotRun(models.Model):
+    """
+    One run of the daily market snapshot: filled in by the task that runs
+    once every chunk of the fan-out has reported back.
+    """
+
+    STATUS_CHOICES = (
+        ("running", "Running"),
+        ("finished", "Finished"),
+        ("failed", "Failed"),
+    )
+
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default="running")
+    chunks = models.PositiveIntegerField(_("Company Chunks"), default=0)
+    companies_updated = models.PositiveIntegerField(_("Companies Updated"), default=0)
+    companies_failed = models.PositiveIntegerField(_("Companies Failed"), default=0)
+    indices_updated = models.PositiveIntegerField(_("Indices Updated"), default=0)
+    indices_failed = models.PositiveIntegerField(_("Indices Failed"), default=0)
+    rows_written = models.PositiveIntegerField(_("Rows Written"), default=0)
+    error = models.TextField(_("Error"), blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Snapshot Run")
+        verbose_name_plural = _("Snapshot Runs")
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} | {self.status}"
+
+    @property
+    def duration(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
@@ -1,5 +1,58 @@
-from stocks.models import MetricCategory
+from django.db.models import QuerySet
+from stocks.models import Company, FinancialValue, ImportFingerprint, Metric, MetricCategory, TimePeriod
+from stocks.utils.company_cache import bump_company_version
+from stocks.utils.gen_fundamentals import mark_fundamentals_dirty
+from stocks.utils.search_index import invalidate_search_index
 
 def create_metric_categories(sender, **kwargs):
     for code, _ in MetricCategory.CATEGORY_CHOICES:
         MetricCategory.objects.get_or_create(code=code)
+
+def _origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+def invalidate_company_cache(sender, instance, origin=None, **kwargs):
+    # Rows cascading from a deleted company are covered by the company's own
+    # bump, and from a metric or period by forget_cascaded_values
+    if sender is not Company and _origin_model(origin) in (Company, Metric, TimePeriod):
+        return
+    company_id = instance.pk if sender is Company else instance.company_id
+    bump_company_version(company_id)
+
+def refresh_search_index(sender, instance, **kwargs):
+    invalidate_search_index()
+
+def forget_import_fingerprints(sender, instance, origin=None, **kwargs):
+    # A hand-edited value no longer matches the workbook it was hashed from,
+    # so the next import of that company must compare every section again.
+    # A deleted company takes its fingerprints with it, and metric or period
+    # deletes clear them once per company in forget_cascaded_values.
+    if _origin_model(origin) in (Company, Metric, TimePeriod):
+        return
+    ImportFingerprint.objects.filter(company_id=instance.company_id).delete()
+
+def mark_company_dirty(sender, instance, origin=None, **kwargs):
+    # Values cascading from a deleted company have nothing left to recompute,
+    # and a mark for it would break its foreign key at commit. Metric and
+    # period deletes mark their companies once in forget_cascaded_values.
+    if _origin_model(origin) in (Company, Metric, TimePeriod):
+        return
+    mark_fundamentals_dirty([instance.company_id])
+
+def forget_cascaded_values(sender, instance, **kwargs):
+    # Deleting a metric or period cascades to its values in every company.
+    # Handle each affected company once here, while the values still exist,
+    # instead of once per value in the receivers above.
+    field = "metric" if sender is Metric else "time_period"
+    company_ids = set(FinancialValue.objects.filter(**{field: instance}).values_list("company_id", flat=True))
+    if not company_ids:
+        return
+    ImportFingerprint.objects.filter(company_id__in=company_ids).delete()
+    mark_fundamentals_dirty(company_ids)
+    for company_id in company_ids:
+        bump_company_version(company_id)
+
+def recompute_formula_metrics(sender, instance, **kwargs):
+    # A new or edited formula has to be evaluated for every company
+    if instance.formula:
+        mark_fundamentals_dirty(Company.objects.values_list("id", flat=True))
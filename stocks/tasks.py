@@ -1,35 +1,233 @@
-from celery import shared_task
-from django.db import transaction
-from stocks.models import Company
-from stocks.utils.marketsnapshot import get_live_snapshot, get_weekly_updates
+import logging
+
+from celery import chord, shared_task
+from django.utils import timezone
+from stocks.models import Company, FailedFetch, Index, SnapshotRun
+from stocks.utils.marketsnapshot import (
+    SNAPSHOT_BATCH_SIZE,
+    WEEKLY_BATCH_SIZE,
+    finish_run,
+    get_live_snapshot,
+    get_live_snapshots,
+    get_weekly_snapshots,
+)
 from stocks.utils.get_index_histories import append_index
+from stocks.utils.price_matrix import build_price_matrix
+from stocks.utils.background_jobs import run_job
+from stocks.utils.gen_fundamentals import recompute_dirty_fundamentals
+from stocks.utils.circuit_breaker import CircuitOpenError
+from stocks.utils.failed_fetches import clear_failed_fetches, record_failed_fetches
+from stocks.utils.market_data import get_breaker
+from stocks.utils.company_pages import warm_company_pages
+
+logger = logging.getLogger(__name__)
+
+# Snapshot tasks retry themselves with get_breaker().backoff() rather than a
+# fixed schedule, so throttled tasks do not all come back at once
+SNAPSHOT_MAX_RETRIES = 3
+
+
+def _fetch_failed(task, kind, targets, exc):
+    """
+    Records the failed targets and schedules a jittered retry. While the
+    breaker is open, or once the retries are used up, it returns instead so
+    the task can report the failure; the retry pass picks the targets up
+    once the provider recovers.
+    """
+    record_failed_fetches(kind, {target: exc for target in targets})
+    if isinstance(exc, CircuitOpenError) or task.request.retries >= task.max_retries:
+        logger.warning("Giving up %s for %d targets: %s", kind, len(targets), exc)
+        return
+    raise task.retry(exc=exc, countdown=get_breaker().backoff(task.request.retries))
 
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, retry_kwargs={"max_retries": 3})
+@shared_task(bind=True, max_retries=SNAPSHOT_MAX_RETRIES)
 def update_company_snapshot(self, company_id):
     company = Company.objects.get(id=company_id)
-    get_live_snapshot(company)
+    try:
+        updated = get_live_snapshot(company)
+    except Exception as e:
+        _fetch_failed(self, "company_snapshot", [company], e)
+        return False
+    if updated:
+        clear_failed_fetches("company_snapshot", [company])
+    else:
+        record_failed_fetches("company_snapshot", {company: "no data returned"})
+    return updated
 
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, retry_kwargs={"max_retries": 3})
+@shared_task(bind=True, max_retries=SNAPSHOT_MAX_RETRIES)
+def update_company_snapshots(self, company_ids):
+    """
+    Snapshot of one chunk of companies. Returns get_live_snapshots' report,
+    with every company failed when the whole download did.
+    """
+    companies = list(Company.objects.filter(id__in=company_ids))
+    try:
+        report = get_live_snapshots(companies)
+    except Exception as e:
+        _fetch_failed(self, "company_snapshot", companies, e)
+        return {"updated": [], "failed": {company.ticker: str(e) for company in companies}}
+    by_ticker = {company.ticker: company for company in companies}
+    clear_failed_fetches("company_snapshot", [by_ticker[ticker] for ticker in report["updated"]])
+    record_failed_fetches(
+        "company_snapshot",
+        {by_ticker[ticker]: reason for ticker, reason in report["failed"].items()},
+    )
+    return report
+
+
+@shared_task(bind=True, max_retries=SNAPSHOT_MAX_RETRIES)
 def update_index_snapshot(self, index_id):
+    """
+    Latest close of one index, reported like update_company_snapshots.
+    """
     index = Index.objects.get(id=index_id)
-    append_index(index)
+    try:
+        updated = append_index(index)
+    except Exception as e:
+        _fetch_failed(self, "index_snapshot", [index], e)
+        return {"updated": [], "failed": {index.ticker: str(e)}}
+    if updated:
+        clear_failed_fetches("index_snapshot", [index])
+        return {"updated": [index.ticker], "failed": {}}
+    record_failed_fetches("index_snapshot", {index: "no data returned"})
+    return {"updated": [], "failed": {index.ticker: "no data returned"}}
 
 
 @shared_task
 def daily_market_snapshot():
-    for company_id in Company.objects.filter(is_active=True).values_list("id", flat=True):
-        update_company_snapshot.delay(company_id)
+    """
+    Fans the snapshot out as a chord of company chunks and indices, and
+    records it as a SnapshotRun that finish_snapshot_run completes once
+    every part has reported.
+    """
+    company_ids = list(Company.objects.filter(is_active=True).values_list("id", flat=True))
+    chunks = [company_ids[start:start + SNAPSHOT_BATCH_SIZE] for start in range(0, len(company_ids), SNAPSHOT_BATCH_SIZE)]
+    run = SnapshotRun.objects.create(chunks=len(chunks))
 
-    for index_id in Index.objects.values_list("id", flat=True):
-        update_index_snapshot.delay(index_id)
+    # finish_snapshot_run tells company reports from index reports by position
+    header = [update_company_snapshots.s(chunk) for chunk in chunks]
+    header += [update_index_snapshot.s(index_id) for index_id in Index.objects.values_list("id", flat=True)]
+    if not header:
+        return finish_snapshot_run([], run.pk)
+
+    chord(header)(finish_snapshot_run.s(run.pk).on_error(fail_snapshot_run.s(run.pk)))
+    return run.pk
+
+
+@shared_task
+def finish_snapshot_run(reports, run_id):
+    """
+    Chord callback: stores the run's totals, then rebuilds the price matrix
+    and warms the cached pages of the companies that were updated.
+    """
+    run = SnapshotRun.objects.get(pk=run_id)
+    updated = finish_run(run, reports)
+
+    refresh_price_matrix.delay()
+    company_ids = list(Company.objects.filter(ticker__in=updated).values_list("id", flat=True))
+    for start in range(0, len(company_ids), SNAPSHOT_BATCH_SIZE):
+        warm_company_cache.delay(company_ids[start:start + SNAPSHOT_BATCH_SIZE])
+    return run.pk
+
+
+@shared_task
+def fail_snapshot_run(request, exc, traceback, run_id):
+    """
+    Chord error callback: a chunk failed outright, so the run never finishes.
+    """
+    SnapshotRun.objects.filter(pk=run_id).update(status="failed", error=str(exc), finished_at=timezone.now())
+
+
+@shared_task
+def warm_company_cache(company_ids):
+    return warm_company_pages(company_ids)
 
 
+@shared_task
+def weekly_market_update():
+    """
+    Fans the weekly info refresh out over chunks of WEEKLY_BATCH_SIZE
+    companies, fetched in parallel by the workers.
+    """
+    company_ids = list(Company.objects.filter(is_active=True).values_list("id", flat=True))
+    for start in range(0, len(company_ids), WEEKLY_BATCH_SIZE):
+        update_weekly_snapshots.delay(company_ids[start:start + WEEKLY_BATCH_SIZE])
+    return len(company_ids)
+
+
+@shared_task
+def update_weekly_snapshots(company_ids, attempt=0):
+    """
+    Weekly info of one chunk of companies. Each company that failed is
+    retried on its own after a jittered backoff, up to SNAPSHOT_MAX_RETRIES
+    times, and recorded for the retry pass.
+    """
+    companies = list(Company.objects.filter(id__in=company_ids))
+    report = get_weekly_snapshots(companies)
+
+    by_ticker = {company.ticker: company for company in companies}
+    clear_failed_fetches("company_info", [by_ticker[ticker] for ticker in report["updated"]])
+    record_failed_fetches(
+        "company_info",
+        {by_ticker[ticker]: reason for ticker, reason in report["failed"].items()},
+    )
+    if report["failed"] and attempt < SNAPSHOT_MAX_RETRIES:
+        breaker = get_breaker()
+        for ticker in report["failed"]:
+            update_weekly_snapshots.apply_async(
+                ([by_ticker[ticker].pk], attempt + 1),
+                countdown=breaker.backoff(attempt),
+            )
+    return report
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=300, retry_kwargs={"max_retries": 2})
-def weekly_market_update(self):
-    for company in Company.objects.filter(is_active=True):
-        with transaction.atomic():
-            get_weekly_updates(company)
 
+@shared_task
+def refresh_price_matrix():
+    return build_price_matrix()
+
+
+@shared_task
+def run_background_job(job_id):
+    return run_job(job_id)
+
+
+@shared_task
+def recompute_fundamentals():
+    return recompute_dirty_fundamentals()
+
+
+@shared_task
+def retry_failed_fetches():
+    """
+    Refetches only the companies and indices whose last snapshot or weekly
+    info fetch failed.
+    Does nothing while the market data breaker is open.
+    """
+    wait = get_breaker().retry_after()
+    if wait:
+        logger.info("Market data circuit open for %.0fs, skipping the retry pass", wait)
+        return {"companies": 0, "indices": 0, "weekly": 0}
+
+    company_ids = list(
+        FailedFetch.objects.filter(kind="company_snapshot", company__isnull=False)
+        .values_list("company_id", flat=True)
+    )
+    for start in range(0, len(company_ids), SNAPSHOT_BATCH_SIZE):
+        update_company_snapshots.delay(company_ids[start:start + SNAPSHOT_BATCH_SIZE])
+
+    index_ids = list(
+        FailedFetch.objects.filter(kind="index_snapshot", index__isnull=False)
+        .values_list("index_id", flat=True)
+    )
+    for index_id in index_ids:
+        update_index_snapshot.delay(index_id)
+
+    info_ids = list(
+        FailedFetch.objects.filter(kind="company_info", company__isnull=False)
+        .values_list("company_id", flat=True)
+    )
+    for start in range(0, len(info_ids), WEEKLY_BATCH_SIZE):
+        update_weekly_snapshots.delay(info_ids[start:start + WEEKLY_BATCH_SIZE])
+    return {"companies": len(company_ids), "indices": len(index_ids), "weekly": len(info_ids)}
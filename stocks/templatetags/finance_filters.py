@@ -33,3 +33,7 @@ def indian_comma(value):
 
     formatted = result + (dot + frac if frac else "")
     return f"-{formatted}" if negative else formatted
+
+@register.filter(name="zip")
+def zip_lists(a, b):
+    return zip(a, b)
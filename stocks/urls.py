@@ -8,6 +8,8 @@ def health(request):
 urlpatterns=[
     path("",views.index, name='index'),
     path("company/<str:ticker>",views.get_stock,name='get-stock'),
+    path("company/<str:ticker>/chart",views.stock_chart,name='stock-chart'),
+    path("company/<str:ticker>/section/<str:section>",views.stock_section,name='stock-section'),
     path("autocomplete/", views.stock_autocomplete, name="stock-autocomplete"),
     path("health/", health),
 ]
@@ -0,0 +1,92 @@
+import logging
+import traceback
+import uuid
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from stocks.models import BackgroundJob
+from stocks.utils.get_historical_data import get_history
+from stocks.utils.get_index_histories import get_index_history
+from stocks.utils.import_excel import import_data_sheet
+from stocks.utils.marketsnapshot import get_live_snapshot, get_weekly_snapshots
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "onboarding"
+
+
+def save_upload(uploaded_file, ticker: str) -> str:
+    """
+    Stores an admin upload where the Celery worker can read it back and
+    returns its storage name.
+    """
+    name = f"{UPLOAD_DIR}/{ticker}-{uuid.uuid4().hex}.xlsx"
+    return default_storage.save(name, uploaded_file)
+
+
+def _update(job, **fields):
+    # Written with .update() so the progress page sees each step as soon as
+    # it happens, independent of any transaction the step itself opens.
+    for name, value in fields.items():
+        setattr(job, name, value)
+    BackgroundJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def _import_upload(job):
+    with default_storage.open(job.upload, "rb") as f:
+        import_data_sheet(f, job.company.ticker)
+
+
+def _weekly_info(job):
+    report = get_weekly_snapshots([job.company])
+    if report["failed"]:
+        raise RuntimeError(report["failed"][job.company.ticker])
+
+
+def company_onboarding_steps(job):
+    # History goes first: fetched incrementally, it starts from the last
+    # stored day, which for a new company means everything
+    steps = [
+        ("Price history", lambda: get_history(job.company)),
+        ("Live snapshot", lambda: get_live_snapshot(job.company)),
+        ("Weekly fundamentals", lambda: _weekly_info(job)),
+    ]
+    if job.upload:
+        steps.append(("Financials import", lambda: _import_upload(job)))
+    return steps
+
+
+def index_history_steps(job):
+    return [("Index history", lambda: get_index_history(job.index))]
+
+
+JOB_STEPS = {
+    "company_onboarding": company_onboarding_steps,
+    "index_history": index_history_steps,
+}
+
+
+def run_job(job_id):
+    """
+    Runs the steps of a BackgroundJob in order, recording the current step
+    and progress after each one. The first failing step fails the job.
+    """
+    job = BackgroundJob.objects.select_related("company", "index").get(pk=job_id)
+    steps = JOB_STEPS[job.kind](job)
+    _update(job, status="running", started_at=timezone.now(), progress=0, error="")
+
+    try:
+        for done, (step, run) in enumerate(steps):
+            _update(job, step=step)
+            run()
+            _update(job, progress=round(100 * (done + 1) / len(steps)))
+    except Exception:
+        logger.exception("Background job %s failed at %s", job.pk, job.step)
+        _update(job, status="failed", error=traceback.format_exc(), finished_at=timezone.now())
+    else:
+        _update(job, status="succeeded", step="", finished_at=timezone.now())
+    finally:
+        if job.upload:
+            default_storage.delete(job.upload)
+    return job.status
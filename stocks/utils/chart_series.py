@@ -0,0 +1,130 @@
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.db.models import Max, Min
+
+from stocks.models import Company, CompanyHistory, Index
+
+
+BENCHMARK_TICKER = "NIFTY50"
+DEFAULT_POINTS = 500
+MAX_POINTS = 2000
+MIN_POINTS = 10
+
+# label -> (lookback, minimum span in days for the range to be offered)
+RANGES = {
+    "1M": (relativedelta(months=1), 30),
+    "6M": (relativedelta(months=6), 180),
+    "1Y": (relativedelta(years=1), 365),
+    "3Y": (relativedelta(years=3), 3 * 365),
+    "5Y": (relativedelta(years=5), 5 * 365),
+    "10Y": (relativedelta(years=10), 10 * 365),
+    "MAX": (None, 0),
+}
+
+
+def lttb_indices(y, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the
+    points of ``y`` to keep; the first and last points are always kept.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=float)
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (threshold - 2)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    indices[-1] = n - 1
+    return indices
+
+
+def available_ranges(first_date, last_date):
+    span = (last_date - first_date).days
+    return [label for label, (_, min_days) in RANGES.items() if span >= min_days]
+
+
+def default_range(ranges):
+    # Widest range short of MAX, same as the chart's initial selection
+    candidates = [label for label in ranges if label != "MAX"]
+    return candidates[-1] if candidates else "MAX"
+
+
+def clamp_points(points) -> int:
+    try:
+        points = int(points)
+    except (TypeError, ValueError):
+        return DEFAULT_POINTS
+    return max(MIN_POINTS, min(points, MAX_POINTS))
+
+
+def build_chart_series(company: Company, range_label=None, points=DEFAULT_POINTS):
+    """
+    Returns the price/volume/benchmark series for ``range_label`` downsampled
+    to at most ``points`` points. Volumes are summed over the days each kept
+    point stands for, so the bars still add up to the traded volume.
+    """
+    bounds = CompanyHistory.objects.filter(company=company).aggregate(
+        first=Min("date"), last=Max("date")
+    )
+    if bounds["last"] is None:
+        return {"has_data": False}
+
+    ranges = available_ranges(bounds["first"], bounds["last"])
+    if range_label not in ranges:
+        range_label = default_range(ranges)
+
+    lookback, _ = RANGES[range_label]
+    start = bounds["last"] - lookback if lookback else bounds["first"]
+
+    rows = list(
+        CompanyHistory.objects
+        .filter(company=company, date__gte=start)
+        .order_by("date")
+        .values_list("date", "closing_price", "volume")
+    )
+    dates = [row[0] for row in rows]
+    prices = np.array([row[1] for row in rows], dtype=float)
+    volumes = np.array([row[2] for row in rows], dtype=np.int64)
+
+    keep = lttb_indices(prices, points)
+    kept_dates = [dates[i] for i in keep]
+
+    index_prices = []
+    benchmark = Index.objects.filter(ticker=BENCHMARK_TICKER).first()
+    if benchmark:
+        lookup = dict(
+            benchmark.history
+            .filter(date__gte=kept_dates[0], date__lte=kept_dates[-1])
+            .values_list("date", "value")
+        )
+        index_prices = [
+            float(lookup[d]) if d in lookup else None for d in kept_dates
+        ]
+
+    return {
+        "has_data": True,
+        "range": range_label,
+        "ranges": ranges,
+        "dates": [d.strftime("%Y-%m-%d") for d in kept_dates],
+        "prices": [round(float(p), 2) for p in prices[keep]],
+        "volumes": np.add.reduceat(volumes, keep).tolist(),
+        "index_prices": index_prices,
+    }
@@ -0,0 +1,154 @@
+import random
+import time
+
+from django.core.cache import cache
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose breaker is open.
+    ``retry_after`` is the number of seconds until the next probe is allowed.
+    """
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker whose state lives in the Django cache, so every
+    worker process sees the same state (with LocMemCache it is per process).
+
+    Calls and failures are counted per ``window`` seconds. The rate is taken
+    over the current and previous window so it does not drop to zero at a
+    window boundary. When at least ``min_calls`` were made and
+    ``error_rate`` of them failed, the breaker opens for ``cooldown``
+    seconds. After the cooldown a single caller is let through as a probe.
+    If the probe succeeds the breaker closes. If it fails the breaker opens
+    again for twice as long, up to ``max_cooldown``.
+    """
+
+    def __init__(self, name, window=60, min_calls=20, error_rate=0.5, cooldown=30, max_cooldown=600,
+                 backoff=60, max_backoff=1800, clock=time.time):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+
+    def _key(self, suffix):
+        return f"{self.name}:{suffix}"
+
+    def _incr(self, key, timeout):
+        cache.add(key, 0, timeout)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            cache.set(key, 1, timeout)
+            return 1
+
+    def _counters(self, bucket):
+        return self._key(f"calls:{bucket}"), self._key(f"failures:{bucket}")
+
+    def error_rate(self) -> float:
+        """
+        Share of failed calls over the current and previous window.
+        """
+        bucket = int(self.clock() // self.window)
+        keys = [*self._counters(bucket), *self._counters(bucket - 1)]
+        counts = cache.get_many(keys)
+        calls = counts.get(keys[0], 0) + counts.get(keys[2], 0)
+        failures = counts.get(keys[1], 0) + counts.get(keys[3], 0)
+        return failures / calls if calls else 0.0
+
+    def _calls(self):
+        bucket = int(self.clock() // self.window)
+        keys = [self._counters(bucket)[0], self._counters(bucket - 1)[0]]
+        return sum(cache.get_many(keys).values())
+
+    def retry_after(self) -> float:
+        """
+        Seconds until the breaker lets a probe through, 0 when closed.
+        """
+        open_until = cache.get(self._key("open_until"))
+        if open_until is None:
+            return 0
+        return max(open_until - self.clock(), 0)
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead. Once the cooldown is over exactly one
+        caller is allowed through as the probe.
+        """
+        open_until = cache.get(self._key("open_until"))
+        if open_until is None:
+            return True
+        if self.clock() < open_until:
+            return False
+        # cache.add is atomic: only one caller wins the probe
+        return cache.add(self._key("probe"), 1, self.max_cooldown)
+
+    def record_success(self):
+        calls, _ = self._counters(int(self.clock() // self.window))
+        self._incr(calls, self.window * 2)
+        open_until = cache.get(self._key("open_until"))
+        # Only the probe closes the breaker, not calls already in flight
+        if open_until is not None and self.clock() >= open_until:
+            cache.delete_many([self._key("open_until"), self._key("probe"), self._key("trips")])
+
+    def record_failure(self):
+        calls, failures = self._counters(int(self.clock() // self.window))
+        self._incr(calls, self.window * 2)
+        self._incr(failures, self.window * 2)
+
+        open_until = cache.get(self._key("open_until"))
+        if open_until is not None:
+            # Likewise only a failed probe reopens it for longer
+            if self.clock() >= open_until:
+                self._trip()
+        elif self._calls() >= self.min_calls and self.error_rate() >= self.error_rate_threshold:
+            self._trip()
+
+    def _trip(self):
+        trips = self._incr(self._key("trips"), self.max_cooldown * 2)
+        cooldown = min(self.cooldown * 2 ** (trips - 1), self.max_cooldown)
+        cache.set(self._key("open_until"), self.clock() + cooldown, self.max_cooldown * 2)
+        cache.delete(self._key("probe"))
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls ``func`` through the breaker. Raises CircuitOpenError instead of
+        calling it while the breaker is open.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Jittered delay before retry ``attempt`` (0-based). The delay doubles
+        with each attempt and grows with the observed error rate, up to
+        five times the base when every call fails. The delay is drawn
+        uniformly from the upper half of that range, so retries that failed
+        together do not all come back at the same moment. While the breaker
+        is open the delay always lasts past the cooldown, spread over one
+        extra cooldown.
+        """
+        ceiling = min(self.base_backoff * 2 ** attempt * (1 + 4 * self.error_rate()), self.max_backoff)
+        delay = random.uniform(ceiling / 2, ceiling)
+        wait = self.retry_after()
+        if wait:
+            delay = max(delay, wait + random.uniform(0, self.cooldown))
+        return delay
@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(company_id) -> str:
+    return f"stocks:company:{company_id}:version"
+
+
+def get_cache_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter can never fall back to a
+        # version that still has entries cached under it.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(key: str):
+    """
+    Moves the version stored at ``key`` forward once the surrounding
+    transaction commits, so a concurrent reader can't cache pre-commit data
+    under the new version.
+    """
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def get_company_version(company_id) -> int:
+    return get_cache_version(_version_key(company_id))
+
+
+def bump_company_version(company_id):
+    """
+    Invalidates every cached page fragment for the company.
+    """
+    bump_cache_version(_version_key(company_id))
+
+
+def company_cache_key(company_id, name: str) -> str:
+    return f"stocks:company:{company_id}:v{get_company_version(company_id)}:{name}"
+
+
+def cached_for_company(company_id, name: str, build):
+    """
+    Returns the cached value for ``name`` at the company's current version,
+    calling ``build()`` and caching its result on a miss.
+    """
+    key = company_cache_key(company_id, name)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.COMPANY_CACHE_TIMEOUT)
+    return value
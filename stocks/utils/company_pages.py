@@ -0,0 +1,75 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from stocks.models import Company, CompanyFundamental
+from stocks.utils.chart_series import build_chart_series
+from stocks.utils.company_cache import cached_for_company
+from stocks.utils.statements import STATEMENTS, get_statement
+
+# Sections of the company page, in display order, loaded lazily by HTMX
+SECTIONS = {
+    'chart': 'Price & Volume',
+    'quarterly': 'Quarterly Results',
+    'pnl': 'Profit & Loss',
+    'bs': 'Balance Sheet',
+    'cf': 'Cash Flows',
+    'ratios': 'Ratios',
+}
+
+# Cached fragments that change with every price update, rebuilt by
+# warm_company_pages after the daily snapshot
+PRICE_FRAGMENTS = ['header', 'section:chart']
+
+
+def render_header(company: Company) -> str:
+    fundamentals = get_object_or_404(CompanyFundamental, company=company)
+    snapshot = company.market
+    return render_to_string('stocks/partials/company_header.html', {
+        'company': company,
+        'snapshot': snapshot,
+        'fundamentals': fundamentals,
+    })
+
+
+def render_section(company: Company, section: str) -> str:
+    if section == 'chart':
+        chart_data = build_chart_series(company)
+        chart_data['url'] = reverse('stock-chart', args=[company.ticker])
+        return render_to_string('stocks/partials/_price_volume_chart.html', {'chart_data': chart_data})
+
+    periods, table_data = [], []
+    if section in STATEMENTS:
+        periods, table_data = get_statement(company, section)
+
+    return render_to_string('stocks/partials/financial_table.html', {
+        'title': SECTIONS[section],
+        'periods': periods,
+        'table_data': table_data,
+    })
+
+
+def render_fragment(company: Company, name: str) -> str:
+    if name == 'header':
+        return render_header(company)
+    return render_section(company, name.removeprefix('section:'))
+
+
+def warm_company_pages(company_ids, fragments=PRICE_FRAGMENTS) -> int:
+    """
+    Renders and caches ``fragments`` of each company's page at its current
+    version, so the first visitor after a data update gets a cache hit.
+    Companies whose page cannot render yet (e.g. no fundamentals) are
+    skipped. Returns the number of companies warmed.
+    """
+    warmed = 0
+    for company in Company.objects.filter(id__in=company_ids).select_related('market'):
+        try:
+            for name in fragments:
+                cached_for_company(company.pk, name, lambda: render_fragment(company, name))
+        except (Http404, ObjectDoesNotExist):
+            continue
+        warmed += 1
+    return warmed
@@ -0,0 +1,51 @@
+from django.utils import timezone
+
+from stocks.models import Company, FailedFetch
+from stocks.utils.get_historical_data import history_symbol
+
+
+def _target_fields(target):
+    if isinstance(target, Company):
+        return {"company": target, "symbol": history_symbol(target)}
+    return {"index": target, "symbol": target.metadata.get("yahoo_symbol") or target.name}
+
+
+def record_failed_fetches(kind, failures):
+    """
+    Records {target: error} failures of ``kind``, where each target is a
+    Company or an Index. Targets that already failed get their attempt
+    count raised. Uses three queries whatever the number of failures.
+    """
+    if not failures:
+        return
+    rows = {}
+    for target, error in failures.items():
+        fields = _target_fields(target)
+        rows[fields["symbol"]] = (fields, str(error))
+
+    now = timezone.now()
+    existing = list(FailedFetch.objects.filter(kind=kind, symbol__in=rows))
+    for fetch in existing:
+        fetch.attempts += 1
+        fetch.error = rows[fetch.symbol][1]
+        fetch.last_failed_at = now
+    FailedFetch.objects.bulk_update(existing, ["attempts", "error", "last_failed_at"])
+
+    seen = {fetch.symbol for fetch in existing}
+    FailedFetch.objects.bulk_create(
+        [
+            FailedFetch(kind=kind, error=error, **fields)
+            for symbol, (fields, error) in rows.items()
+            if symbol not in seen
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def clear_failed_fetches(kind, targets):
+    """
+    Forgets earlier failures of targets that have now been fetched.
+    """
+    symbols = [_target_fields(target)["symbol"] for target in targets]
+    if symbols:
+        FailedFetch.objects.filter(kind=kind, symbol__in=symbols).delete()
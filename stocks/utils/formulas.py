@@ -0,0 +1,164 @@
+import ast
+import logging
+from graphlib import CycleError, TopologicalSorter
+
+import numpy as np
+import pandas as pd
+from django.db.models import Q
+
+from stocks.models import Company, FinancialValue, Metric
+from stocks.utils.company_cache import bump_company_version
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd,
+)
+
+# Numbers in a formula are evaluated as this numpy float
+_FLOAT = "__float__"
+
+
+class FormulaError(ValueError):
+    pass
+
+
+class _FloatConstants(ast.NodeTransformer):
+    # Python ints have no size limit, so ``9 ** 9 ** 9`` on int constants
+    # would never finish; numpy floats overflow to inf instead
+    def visit_Constant(self, node):
+        call = ast.Call(func=ast.Name(_FLOAT, ast.Load()), args=[node], keywords=[])
+        return ast.copy_location(call, node)
+
+
+def parse_formula(formula: str):
+    """
+    Compiles a formula over metric codes, e.g. ``NET_PROFIT / SALES * 100``,
+    into (code object, set of referenced metric codes). Only arithmetic on
+    metric codes and numbers is allowed.
+    """
+    try:
+        tree = ast.parse(formula.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula {formula!r}: {e.msg}") from e
+
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"Unsupported expression in {formula!r}: {type(node).__name__}")
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)):
+                raise FormulaError(f"Unsupported constant in {formula!r}: {node.value!r}")
+            try:
+                node.value = float(node.value)
+            except OverflowError as e:
+                raise FormulaError(f"Number too large in {formula!r}") from e
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+    tree = ast.fix_missing_locations(_FloatConstants().visit(tree))
+    return compile(tree, "<formula>", "eval"), names
+
+
+def derived_metrics():
+    """
+    Returns [(metric, code object, dependencies)] for every Metric with a
+    formula, ordered so each comes after the derived metrics it uses.
+    Metrics with invalid formulas or in a dependency cycle are logged and
+    left out.
+    """
+    compiled = {}
+    for metric in Metric.objects.exclude(Q(formula__isnull=True) | Q(formula="")):
+        try:
+            compiled[metric.code] = (metric, *parse_formula(metric.formula))
+        except FormulaError as e:
+            logger.warning("Skipping metric %s: %s", metric.code, e)
+
+    while True:
+        graph = TopologicalSorter({
+            code: names & compiled.keys() for code, (_, _, names) in compiled.items()
+        })
+        try:
+            order = list(graph.static_order())
+        except CycleError as e:
+            cycle = set(e.args[1])
+            logger.warning("Skipping metrics in a formula cycle: %s", ", ".join(sorted(cycle)))
+            compiled = {code: item for code, item in compiled.items() if code not in cycle}
+            continue
+        return [compiled[code] for code in order]
+
+
+def evaluate_derived_metrics(company_ids=None):
+    """
+    Evaluates every formula metric for the given companies (all when None)
+    across all of their periods at once: input values are pivoted into one
+    (company, period) x metric frame and each formula runs on whole columns.
+    Results are upserted as FinancialValue rows. Returns the number of
+    values written.
+    """
+    formulas = derived_metrics()
+    if not formulas:
+        return 0
+    derived_codes = {metric.code for metric, _, _ in formulas}
+    input_codes = set().union(*(names for _, _, names in formulas)) - derived_codes
+
+    values = FinancialValue.objects.filter(metric__code__in=input_codes, value__isnull=False)
+    existing = FinancialValue.objects.filter(metric__code__in=derived_codes)
+    if company_ids is not None:
+        values = values.filter(company_id__in=company_ids)
+        existing = existing.filter(company_id__in=company_ids)
+
+    rows = list(values.values_list("company_id", "time_period_id", "metric__code", "value"))
+    frame = pd.DataFrame(rows, columns=["company_id", "time_period_id", "code", "value"])
+    frame["value"] = frame["value"].astype(float)
+    frame = frame.pivot_table(
+        index=["company_id", "time_period_id"], columns="code", values="value", aggfunc="last",
+    )
+    if frame.empty:
+        frame = pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=["company_id", "time_period_id"]))
+
+    results = {}
+    for metric, code, names in formulas:
+        env = {
+            name: frame[name].to_numpy() if name in frame else np.full(len(frame), np.nan)
+            for name in names
+        }
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            result = np.asarray(eval(code, {"__builtins__": {}, _FLOAT: np.float64}, env), dtype=float)
+        result = np.broadcast_to(result, (len(frame),)).copy()
+        result[~np.isfinite(result)] = np.nan
+        frame[metric.code] = result
+        results[metric] = result
+
+    written = {}
+    for metric, result in results.items():
+        keep = ~np.isnan(result)
+        for (company_id, period_id), value in zip(frame.index[keep], result[keep]):
+            written[(int(company_id), metric.pk, int(period_id))] = round(float(value), 4)
+    # Derived values whose inputs are gone are cleared rather than deleted,
+    # which would fire the FinancialValue delete signals
+    for key in existing.values_list("company_id", "metric_id", "time_period_id"):
+        written.setdefault(key, None)
+
+    FinancialValue.objects.bulk_create(
+        [
+            FinancialValue(company_id=company_id, metric_id=metric_id, time_period_id=period_id, value=value)
+            for (company_id, metric_id, period_id), value in written.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["company", "metric", "time_period"],
+        update_fields=["value"],
+        batch_size=BATCH_SIZE,
+    )
+
+    # bulk writes skip post_save, so invalidate cached pages explicitly
+    touched = {company_id for company_id, _, _ in written}
+    if company_ids is None:
+        touched |= set(Company.objects.values_list("id", flat=True))
+    else:
+        touched |= set(company_ids)
+    for company_id in touched:
+        bump_company_version(company_id)
+    return len(written)
@@ -2,91 +2,266 @@ from decimal import Decimal
 from stocks.models import (
     Company,
     FinancialValue,
-    Metric,
     CompanyFundamental,
-    TimePeriod
+    DirtyCompany,
 )
-from django.db.models import Sum,Count
-from datetime import date
+from stocks.utils.company_cache import bump_company_version
+from stocks.utils.formulas import evaluate_derived_metrics
+from stocks.utils.growth import compute_growth
+from stocks.utils.ttm import compute_ttm, latest_ttm_values
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
 
+import numpy as np
+import pandas as pd
 
-def safe_percentage(a, b):
-    if a is None or b in (None, 0):
-        return None
-    return (Decimal(a) / Decimal(b)) * 100
-
-def get_annual_value(company,metric_code):
-    fv=FinancialValue.objects.filter(
-        company=company,
-        metric__code=metric_code,
-        time_period__period_type='annual',
-    ).select_related('time_period').order_by('-time_period__year').first()
-    return fv.value if fv else None
-
-def get_yearly_quarter_value_sum(company,year, metric_code):
-    qs = FinancialValue.objects.filter(
-        company=company,
-        metric__code=metric_code,
-        time_period__period_type="quarterly",
-        time_period__year=year
-    ).select_related('time_period').aggregate(
-        total=Sum('value'),
-        cnt=Count('value')
-    )
-    return qs['total'] if qs['cnt']==4 else None
 
+TTM_METRICS = ["SALES", "OPERATING_PROFIT", "NET_PROFIT"]
+ANNUAL_METRICS = ["EQUITY_SHARE_CAPITAL", "RESERVES", "BORROWINGS"]
 
+# metric code -> CompanyFundamental field prefix, e.g. sales_cagr_5y
+CAGR_METRICS = {"SALES": "sales", "NET_PROFIT": "profit"}
+CAGR_YEARS = (3, 5, 10)
 
-def generate_company_fundamentals(company):
+FUNDAMENTAL_FIELDS = [
+    "revenue", "operating_margin", "net_margin", "roe", "roce", "debt_to_equity",
+    *(f"{prefix}_cagr_{years}y" for prefix in CAGR_METRICS.values() for years in CAGR_YEARS),
+]
 
-    q_year = date.today().year -1
-    revenue = get_yearly_quarter_value_sum(company,q_year,"SALES")
-    operating_profit = get_yearly_quarter_value_sum(company,q_year,"OPERATING_PROFIT")
-    net_profit = get_yearly_quarter_value_sum(company,q_year,"NET_PROFIT")
+BATCH_SIZE = 1000
 
-    equity_share_capital = get_annual_value(company,"EQUITY_SHARE_CAPITAL")
-    reserves = get_annual_value(company,"RESERVES")
-    total_debt = get_annual_value(company,"BORROWINGS")
+RECOMPUTE_SCHEDULED_KEY = "stocks:fundamentals:recompute_scheduled"
 
-    total_equity = (
-        (equity_share_capital or 0) +
-        (reserves or 0)
-        if equity_share_capital or reserves else None
-    )
-    capital_employed = (
-        (total_equity or 0) +
-        (total_debt or 0)
-        if total_equity or total_debt else None
+
+def latest_annual_values(company_ids):
+    """
+    {(company_id, metric_code): value} of the latest annual period per
+    company and metric, in one DISTINCT ON query.
+    """
+    rows = (
+        FinancialValue.objects
+        .filter(
+            company_id__in=company_ids,
+            metric__code__in=ANNUAL_METRICS,
+            time_period__period_type="annual",
+        )
+        .order_by("company_id", "metric__code", "-time_period__year")
+        .distinct("company_id", "metric__code")
+        .values_list("company_id", "metric__code", "value")
     )
+    return {(company_id, code): value for company_id, code, value in rows}
+
+
+def _frame(company_ids, values, codes):
+    # companies x metric codes, NaN where a value is missing
+    frame = pd.DataFrame(np.nan, index=pd.Index(company_ids), columns=codes)
+    for (company_id, code), value in values.items():
+        if value is not None:
+            frame.at[company_id, code] = float(value)
+    return frame
+
 
-    operating_margin = safe_percentage(operating_profit, revenue)
-    net_margin = safe_percentage(net_profit, revenue)
-    roe = safe_percentage(net_profit, total_equity)
-    roce = safe_percentage(operating_profit, capital_employed)
-    debt_to_equity = safe_percentage(total_debt, total_equity)/100
-
-    CompanyFundamental.objects.update_or_create(
-        company=company,
-        defaults={
-            "revenue": revenue,
-            "operating_margin": operating_margin,
-            "net_margin": net_margin,
-            "roe": roe,
-            "roce": roce,
-            "debt_to_equity": debt_to_equity,
-        }
+def _either(a, b):
+    # a + b treating missing as 0, but missing when both are missing or 0
+    total = a.fillna(0) + b.fillna(0)
+    return total.where((a.fillna(0) != 0) | (b.fillna(0) != 0))
+
+
+def _percentage(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (a / b * 100).where(b.notna() & (b != 0))
+
+
+def _cagr(start, end, years):
+    # Undefined for a missing or non-positive base and for a negative end
+    valid = (start > 0) & (end >= 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (np.where(valid, end, 1) / np.where(valid, start, 1)) ** (1 / years) - 1
+    return np.where(valid, growth * 100, np.nan)
+
+
+def cagr_columns(company_ids):
+    """
+    Sales and profit CAGR over CAGR_YEARS for every company, from one query
+    over the annual series. Growth runs from the latest annual year a
+    company reported the metric back ``years`` years.
+    """
+    columns = {
+        f"{prefix}_cagr_{years}y": np.full(len(company_ids), np.nan)
+        for prefix in CAGR_METRICS.values() for years in CAGR_YEARS
+    }
+    rows = list(
+        FinancialValue.objects
+        .filter(
+            company_id__in=company_ids,
+            metric__code__in=CAGR_METRICS,
+            time_period__period_type="annual",
+            value__isnull=False,
+        )
+        .values_list("company_id", "metric__code", "time_period__year", "value")
     )
+    if not rows:
+        return pd.DataFrame(columns, index=company_ids)
+
+    df = pd.DataFrame(rows, columns=["company_id", "code", "year", "value"])
+    df["value"] = df["value"].astype(float)
+    # Every year in between, so "n years back" is always n columns back
+    years_range = range(df["year"].min(), df["year"].max() + 1)
+    positions = np.arange(len(company_ids))
+
+    for code, prefix in CAGR_METRICS.items():
+        series = (
+            df[df["code"] == code]
+            .pivot_table(index="company_id", columns="year", values="value", aggfunc="last")
+            .reindex(index=company_ids, columns=years_range)
+            .to_numpy()
+        )
+        reported = ~np.isnan(series)
+        last = series.shape[1] - 1 - reported[:, ::-1].argmax(axis=1)
+        end = np.where(reported.any(axis=1), series[positions, last], np.nan)
+        for years in CAGR_YEARS:
+            first = last - years
+            start = np.where(first >= 0, series[positions, np.maximum(first, 0)], np.nan)
+            columns[f"{prefix}_cagr_{years}y"] = _cagr(start, end, years)
 
+    return pd.DataFrame(columns, index=company_ids)
 
 
+# Largest magnitude the max_digits=6, decimal_places=2 ratio columns hold
+RATIO_LIMIT = Decimal("9999.99")
 
 
+def _decimal(value):
+    # Ratios too large to store (net margin on a tiny revenue, ROE on
+    # near-zero equity) are left empty: one of them would otherwise make the
+    # whole bulk upsert overflow
+    if value is None or not np.isfinite(value):
+        return None
+    value = Decimal(f"{value:.2f}")
+    return value if abs(value) <= RATIO_LIMIT else None
+
+
+def compute_fundamentals(company_ids=None):
+    """
+    Recomputes CompanyFundamental for the given companies (every active
+    company when None) with three grouped queries and one bulk upsert:
+    revenue, operating and net profit come from the latest TTM period with
+    sales (see compute_ttm), equity and debt come from the latest annual balance sheet
+    and growth from the annual sales and profit series.
+    Returns the number of companies written.
+    """
+    companies = Company.objects.all()
+    if company_ids is None:
+        companies = companies.filter(is_active=True)
+    else:
+        companies = companies.filter(id__in=company_ids)
+    company_ids = list(companies.values_list("id", flat=True))
+    if not company_ids:
+        return 0
+
+    ttm_values = latest_ttm_values(company_ids, TTM_METRICS)
+    ttm = _frame(company_ids, ttm_values, TTM_METRICS)
+    annual = _frame(company_ids, latest_annual_values(company_ids), ANNUAL_METRICS)
 
+    revenue = ttm["SALES"]
+    total_equity = _either(annual["EQUITY_SHARE_CAPITAL"], annual["RESERVES"])
+    total_debt = annual["BORROWINGS"]
+    capital_employed = _either(total_equity, total_debt)
 
+    ratios = pd.DataFrame({
+        "operating_margin": _percentage(ttm["OPERATING_PROFIT"], revenue),
+        "net_margin": _percentage(ttm["NET_PROFIT"], revenue),
+        "roe": _percentage(ttm["NET_PROFIT"], total_equity),
+        "roce": _percentage(ttm["OPERATING_PROFIT"], capital_employed),
+        "debt_to_equity": _percentage(total_debt, total_equity) / 100,
+    })
+    ratios = ratios.join(cagr_columns(company_ids))
+
+    fundamentals = [
+        CompanyFundamental(
+            company_id=company_id,
+            # Kept as the exact Decimal sum rather than a float
+            revenue=ttm_values.get((company_id, "SALES")),
+            **{name: _decimal(value) for name, value in row.items()},
+        )
+        for company_id, row in zip(company_ids, ratios.to_dict("records"))
+    ]
+    CompanyFundamental.objects.bulk_create(
+        fundamentals,
+        update_conflicts=True,
+        unique_fields=["company"],
+        update_fields=[*FUNDAMENTAL_FIELDS, "updated_at"],
+        batch_size=BATCH_SIZE,
+    )
+    # bulk_create skips post_save, so invalidate cached pages explicitly
+    for company_id in company_ids:
+        bump_company_version(company_id)
+    return len(fundamentals)
 
 
+def generate_company_fundamentals(company):
+    compute_ttm([company.pk])
+    evaluate_derived_metrics([company.pk])
+    compute_growth([company.pk])
+    compute_fundamentals([company.pk])
 
 
 def generate_all_company_fundamentals():
-    for company in Company.objects.filter(is_active=True):
-        generate_company_fundamentals(company)
+    """
+    Rebuilds everything derived from the stored financial values for every
+    company. This is the backfill path after a deploy adds a derived table:
+    formula metrics seeded by a migration, growth rows.
+    """
+    compute_ttm()
+    evaluate_derived_metrics()
+    compute_growth()
+    return compute_fundamentals()
+
+
+def _schedule_recompute():
+    from stocks.tasks import recompute_fundamentals
+
+    # One delayed run per window, however many edits land inside it
+    delay = settings.FUNDAMENTALS_RECOMPUTE_DELAY
+    if cache.add(RECOMPUTE_SCHEDULED_KEY, True, delay):
+        recompute_fundamentals.apply_async(countdown=delay)
+
+
+def mark_fundamentals_dirty(company_ids):
+    """
+    Records that the companies' financial values changed and schedules a
+    recompute of their fundamentals once the transaction commits.
+    """
+    now = timezone.now()
+    DirtyCompany.objects.bulk_create(
+        [DirtyCompany(company_id=company_id, marked_at=now) for company_id in set(company_ids)],
+        update_conflicts=True,
+        unique_fields=["company"],
+        update_fields=["marked_at"],
+    )
+    transaction.on_commit(_schedule_recompute)
+
+
+def recompute_dirty_fundamentals(company_ids=None):
+    """
+    Recomputes TTM values, derived metrics, growth and fundamentals of the
+    dirty companies (only those among ``company_ids`` when given) and clears their
+    marks. Companies marked again while this runs stay dirty for the next
+    run. Returns the number of companies recomputed.
+    """
+    started = timezone.now()
+    dirty = DirtyCompany.objects.all()
+    if company_ids is not None:
+        dirty = dirty.filter(company_id__in=company_ids)
+    dirty_ids = list(dirty.values_list("company_id", flat=True))
+    if not dirty_ids:
+        return 0
+
+    compute_ttm(dirty_ids)
+    evaluate_derived_metrics(dirty_ids)
+    compute_growth(dirty_ids)
+    count = compute_fundamentals(dirty_ids)
+    DirtyCompany.objects.filter(company_id__in=dirty_ids, marked_at__lte=started).delete()
+    return count
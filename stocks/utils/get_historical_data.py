@@ -1,21 +1,42 @@
+import pandas as pd
 from stocks.models import Company, CompanyHistory
-import yfinance as yf
+from django.db.models import Max
+from stocks.utils.company_cache import bump_company_version
+from stocks.utils.history_loader import upsert_frame
+from stocks.utils.market_data import get_provider
 
-def get_history(company: Company):
-    symbol = f"{company.ticker}.NS"
-    stock = yf.Ticker(symbol)
-    df = stock.history(start="1900-01-01")
-    records=[]
-    for idx,row in df.iterrows():
-        records.append(
-            CompanyHistory(
-                company=company,
-                date = idx.date(),
-                closing_price=row["Close"],
-                volume = row['Volume']
-            )
-        )
-    CompanyHistory.objects.bulk_create(
-        records,
-        ignore_conflicts=True
-    )
\ No newline at end of file
+
+def get_history(company: Company, full: bool = False):
+    """
+    Fetches daily prices for the company. By default only the tail from the
+    last stored date onwards is requested (that day included, so a partial
+    close gets corrected); ``full`` refetches everything.
+    """
+    last_date = None
+    if not full:
+        last_date = company.price_history.aggregate(last=Max("date"))["last"]
+
+    df = get_provider().history(history_symbol(company), start=last_date)
+    return write_history(company, df)
+
+
+def history_symbol(company: Company) -> str:
+    return f"{company.ticker}.NS"
+
+
+def write_history(company: Company, df) -> int:
+    """
+    Upserts a provider history frame (Close, Volume by date) for the
+    company and returns the number of days written.
+    """
+    df = df.dropna(subset=["Close"])
+    frame = pd.DataFrame({
+        "company_id": company.pk,
+        "date": df.index.normalize(),
+        "closing_price": df["Close"].round(2).to_numpy(),
+        "volume": df["Volume"].fillna(0).astype("int64").to_numpy(),
+    })
+    count = upsert_frame(CompanyHistory, ["company", "date", "closing_price", "volume"], ["company", "date"], frame)
+    # The loader skips post_save, so invalidate cached pages explicitly
+    bump_company_version(company.pk)
+    return count
@@ -1,48 +1,61 @@
+import pandas as pd
 from stocks.models import Index, IndexHistory
-import yfinance as yf
 from decimal import Decimal
-from django.utils.timezone import make_naive
-def get_index_history(index: Index):
+from django.db.models import Max
+from stocks.utils.history_loader import upsert_frame
+from stocks.utils.market_data import get_provider
 
+
+def get_index_history(index: Index, full: bool = False):
+    """
+    Fetches daily index closes. Like get_history, only the tail from the
+    last stored date is requested unless ``full`` is set.
+    """
     symbol = index.metadata.get("yahoo_symbol")
     if not symbol:
         return
-    stock = yf.Ticker(symbol)
-    df = stock.history(period="max")
-    records=[]
-    for idx,row in df.iterrows():
-        if row.isna().any():
-            continue
-        records.append(
-            IndexHistory(
-                index=index,
-                date = make_naive(idx).date(),
-                value=Decimal(row["Close"]),
-            )
-        )
-    IndexHistory.objects.bulk_create(
-        records,
-        ignore_conflicts=True
-    )
+
+    last_date = None
+    if not full:
+        last_date = index.history.aggregate(last=Max("date"))["last"]
+
+    df = get_provider().history(symbol, start=last_date)
+    return write_index_history(index, df)
 
 
+def write_index_history(index: Index, df) -> int:
+    """
+    Upserts a provider history frame for the index and returns the number
+    of days written.
+    """
+    df = df.dropna(subset=["Close"])
+    frame = pd.DataFrame({
+        "index_id": index.pk,
+        "date": df.index.normalize(),
+        "value": df["Close"].round(2).to_numpy(),
+    })
+    return upsert_frame(IndexHistory, ["index", "date", "value"], ["index", "date"], frame)
 
-def append_index(index: Index):
+
+
+def append_index(index: Index) -> bool:
+    """
+    Stores the latest close of the index. Returns False when the provider
+    has no data for it; provider errors propagate so the caller can retry.
+    """
     symbol = index.metadata.get("yahoo_symbol")
     if not symbol:
-        return
+        return True
 
-    stock = yf.Ticker(symbol)
-    df = stock.history(period="5d")
-    if df.empty:
-        return
-    last_row = df.dropna().iloc[-1]
-    ts = last_row.name
+    quote = get_provider().latest_quotes([symbol]).get(symbol)
+    if quote is None:
+        return False
 
     IndexHistory.objects.update_or_create(
         index=index,
-        date=make_naive(ts).date(),
+        date=quote.date,
         defaults={
-            "value": Decimal(last_row["Close"]),
+            "value": Decimal(quote.close),
         }
     )
+    return True
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from stocks.models import FinancialGrowth, FinancialValue
+from stocks.utils.company_cache import bump_company_version
+
+# Statement categories growth is shown for
+GROWTH_CATEGORIES = ["PNL", "BS", "CF"]
+BATCH_SIZE = 1000
+
+# period_type -> (sequence of a period, steps back for YoY, steps back for QoQ)
+PERIOD_STEPS = {
+    "annual": (lambda year, quarter: year, 1, None),
+    "quarterly": (lambda year, quarter: year * 4 + quarter - 1, 4, 1),
+}
+
+
+def growth(values, steps):
+    """
+    % change of each column against the column ``steps`` earlier, measured
+    against the absolute base so a loss narrowing shows as growth. NaN when
+    either side is missing or the base is zero.
+    """
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] > steps:
+        current, base = values[:, steps:], values[:, :-steps]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = (current - base) / np.abs(base) * 100
+        out[:, steps:] = np.where(base != 0, change, np.nan)
+    return out
+
+
+def compute_growth(company_ids=None):
+    """
+    Stores YoY (and for quarters QoQ) growth of every annual and quarterly
+    statement value as FinancialGrowth rows. Each period type is pivoted
+    into a (company, metric) x consecutive-periods array so the whole
+    universe is one array operation. Returns the number of rows written.
+    """
+    values = FinancialValue.objects.filter(
+        metric__category__code__in=GROWTH_CATEGORIES,
+        time_period__period_type__in=PERIOD_STEPS,
+        value__isnull=False,
+    )
+    existing = FinancialGrowth.objects.all()
+    if company_ids is not None:
+        values = values.filter(company_id__in=company_ids)
+        existing = existing.filter(financial_value__company_id__in=company_ids)
+
+    rows = list(values.values_list(
+        "pk", "company_id", "metric_id", "time_period__period_type",
+        "time_period__year", "time_period__quarter", "value",
+    ))
+    df = pd.DataFrame(rows, columns=["pk", "company_id", "metric_id", "period_type", "year", "quarter", "value"])
+    df["value"] = df["value"].astype(float)
+
+    written = {}
+    for period_type, (sequence, yoy_steps, qoq_steps) in PERIOD_STEPS.items():
+        part = df[df["period_type"] == period_type].copy()
+        if part.empty:
+            continue
+        part["sequence"] = sequence(part["year"], part["quarter"]).astype(int)
+        index = ["company_id", "metric_id"]
+        frame = part.pivot_table(index=index, columns="sequence", values="value", aggfunc="last")
+        pks = part.pivot_table(index=index, columns="sequence", values="pk", aggfunc="last")
+        # Missing periods become NaN columns, so growth never skips a gap
+        sequences = range(frame.columns.min(), frame.columns.max() + 1)
+        frame = frame.reindex(columns=sequences).to_numpy()
+        pks = pks.reindex(columns=sequences).to_numpy()
+
+        yoy = growth(frame, yoy_steps)
+        qoq = growth(frame, qoq_steps) if qoq_steps else np.full(frame.shape, np.nan)
+        for r, c in zip(*np.nonzero(~np.isnan(yoy) | ~np.isnan(qoq))):
+            written[int(pks[r, c])] = (
+                None if np.isnan(yoy[r, c]) else round(float(yoy[r, c]), 2),
+                None if np.isnan(qoq[r, c]) else round(float(qoq[r, c]), 2),
+            )
+
+    for pk in existing.values_list("pk", flat=True):
+        written.setdefault(pk, (None, None))
+
+    FinancialGrowth.objects.bulk_create(
+        [
+            FinancialGrowth(financial_value_id=pk, yoy=yoy, qoq=qoq)
+            for pk, (yoy, qoq) in written.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["financial_value"],
+        update_fields=["yoy", "qoq"],
+        batch_size=BATCH_SIZE,
+    )
+    # bulk writes skip post_save, so invalidate cached pages explicitly
+    touched = set(df["company_id"].unique().tolist())
+    for company_id in touched:
+        bump_company_version(company_id)
+    return len(written)
@@ -0,0 +1,93 @@
+import queue
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import Max
+
+from stocks.models import Company, CompanyHistory, Index, IndexHistory
+from stocks.utils.get_historical_data import history_symbol, write_history
+from stocks.utils.get_index_histories import write_index_history
+from stocks.utils.market_data import get_provider
+from stocks.utils.rate_limit import RateLimiter
+
+RATE_LIMIT_KEY = "stocks:ratelimit:history"
+
+# target is the Company or Index, write(target, frame) stores what was fetched
+FetchJob = namedtuple("FetchJob", ["target", "symbol", "start", "write"])
+
+
+def history_jobs(full=False):
+    """
+    One FetchJob per company and per index with a provider symbol. The last
+    stored dates are read up front with one grouped query per table, so the
+    fetch threads never touch the database.
+    """
+    company_last, index_last = {}, {}
+    if not full:
+        company_last = dict(
+            CompanyHistory.objects.values_list("company_id").annotate(last=Max("date")).order_by()
+        )
+        index_last = dict(
+            IndexHistory.objects.values_list("index_id").annotate(last=Max("date")).order_by()
+        )
+
+    jobs = [
+        FetchJob(company, history_symbol(company), company_last.get(company.pk), write_history)
+        for company in Company.objects.all()
+    ]
+    for index in Index.objects.all():
+        symbol = index.metadata.get("yahoo_symbol")
+        if symbol:
+            jobs.append(FetchJob(index, symbol, index_last.get(index.pk), write_index_history))
+    return jobs
+
+
+def fetch_histories(jobs, workers=None, rate=None, queue_size=None):
+    """
+    Fetches the jobs' histories with ``workers`` provider requests in flight,
+    at most ``rate`` requests per second across all processes, and writes
+    them from the calling thread. Fetched frames wait in a queue of
+    ``queue_size``; when the writer falls behind, fetch threads block rather
+    than piling frames up in memory.
+
+    Returns a summary dict with counts, failures ({symbol: error}), elapsed
+    seconds and throughput.
+    """
+    workers = workers or settings.HISTORY_FETCH_WORKERS
+    rate = settings.HISTORY_FETCH_RATE if rate is None else rate
+    queue_size = queue_size or settings.HISTORY_WRITE_QUEUE_SIZE
+
+    provider = get_provider()
+    limiter = RateLimiter(RATE_LIMIT_KEY, rate)
+    fetched = queue.Queue(maxsize=queue_size)
+
+    def fetch(job):
+        try:
+            limiter.acquire()
+            fetched.put((job, provider.history(job.symbol, start=job.start), None))
+        except Exception as e:
+            fetched.put((job, None, e))
+
+    summary = {"targets": len(jobs), "written": 0, "rows": 0, "failed": {}}
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            pool.submit(fetch, job)
+        for _ in jobs:
+            job, frame, error = fetched.get()
+            if error is None:
+                try:
+                    summary["rows"] += job.write(job.target, frame)
+                    summary["written"] += 1
+                    continue
+                except Exception as e:
+                    error = e
+            summary["failed"][job.symbol] = f"{type(error).__name__}: {error}"
+
+    elapsed = time.monotonic() - started
+    summary["seconds"] = elapsed
+    summary["rows_per_second"] = summary["rows"] / elapsed if elapsed else 0
+    summary["targets_per_second"] = len(jobs) / elapsed if elapsed else 0
+    return summary
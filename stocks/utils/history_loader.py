@@ -0,0 +1,83 @@
+import io
+import uuid
+
+from django.db import connections, router, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+# Rows formatted and streamed per COPY, bounding memory per batch
+COPY_BATCH_SIZE = 50_000
+
+
+def _chunks(frame, size=COPY_BATCH_SIZE):
+    for start in range(0, len(frame), size):
+        yield frame.iloc[start:start + size]
+
+
+def _copy(cursor, sql, buffer):
+    if is_psycopg3:
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+    else:
+        # copy_expert reads from the current position, left at the end by to_csv
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+
+
+def _copy_upsert(connection, model, fields, unique_fields, frame):
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    staging = qn(f"{model._meta.db_table}_staging_{uuid.uuid4().hex[:8]}")
+    columns = [model._meta.get_field(name).column for name in fields]
+    keys = [model._meta.get_field(name).column for name in unique_fields]
+    column_list = ", ".join(qn(c) for c in columns)
+    key_list = ", ".join(qn(c) for c in keys)
+    updates = ", ".join(f"{qn(c)} = EXCLUDED.{qn(c)}" for c in columns if c not in keys)
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM {table} WITH NO DATA"
+        )
+        for chunk in _chunks(frame):
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, header=False, index=False, date_format="%Y-%m-%d")
+            _copy(cursor, f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+                f"ON CONFLICT ({key_list}) DO UPDATE SET {updates}"
+            )
+            cursor.execute(f"TRUNCATE {staging}")
+
+
+def _bulk_upsert(model, fields, unique_fields, frame):
+    attnames = [model._meta.get_field(name).attname for name in fields]
+    for chunk in _chunks(frame):
+        model.objects.bulk_create(
+            [model(**dict(zip(attnames, row))) for row in chunk.itertuples(index=False)],
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=[name for name in fields if name not in unique_fields],
+        )
+
+
+def upsert_frame(model, fields, unique_fields, frame):
+    """
+    Inserts or updates the rows of ``frame`` (columns in ``fields`` order)
+    into ``model``'s table, later duplicates winning. On Postgres each batch
+    is formatted column-wise by pandas, COPY'd into a temporary staging
+    table and merged with one INSERT ... ON CONFLICT, so no model instances
+    are built; other backends fall back to bulk_create. Returns the number
+    of distinct rows loaded.
+    """
+    if frame.empty:
+        return 0
+    # Later rows win; an upsert may not touch the same row twice anyway
+    keys = [frame.columns[fields.index(name)] for name in unique_fields]
+    frame = frame.drop_duplicates(subset=keys, keep="last")
+
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor == "postgresql":
+        _copy_upsert(connection, model, fields, unique_fields, frame)
+    else:
+        _bulk_upsert(model, fields, unique_fields, frame)
+    return len(frame)
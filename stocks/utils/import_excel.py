@@ -1,6 +1,13 @@
-import pandas as pd
+import hashlib
+import math
+import multiprocessing
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
 from django.db import transaction
 from datetime import datetime, date
+from openpyxl import load_workbook
 
 from stocks.models import (
     Company,
@@ -8,10 +15,17 @@ from stocks.models import (
     MetricCategory,
     TimePeriod,
     FinancialValue,
+    ImportFingerprint,
 )
 
-from stocks.utils.gen_fundamentals import generate_company_fundamentals
+from stocks.utils.company_cache import bump_company_version
+from stocks.utils.gen_fundamentals import mark_fundamentals_dirty, recompute_dirty_fundamentals
 
+IMPORT_BATCH_SIZE = 1000
+VALUE_QUANTUM = Decimal("0.0001")
+
+# section is a SECTION_MAP entry, period the report date heading the column
+DataSheetRecord = namedtuple("DataSheetRecord", ["section", "metric", "period", "value"])
 
 
 def normalize_code(name: str) -> str:
@@ -31,7 +45,10 @@ def is_valid_period(label) -> bool:
     return isinstance(label, (datetime, date))
 
 
-def get_or_create_time_period(dt, report_type: str) -> TimePeriod:
+def period_key(dt, report_type: str):
+    """
+    (year, quarter, period_type) of the TimePeriod a report date belongs to.
+    """
     year = dt.year
     month = dt.month
 
@@ -51,34 +68,68 @@ def get_or_create_time_period(dt, report_type: str) -> TimePeriod:
     else:
         raise ValueError("Invalid report_type")
 
-    obj, _ = TimePeriod.objects.get_or_create(
-        year=year - 1 if quarter == 4 else year,
-        quarter=quarter,
-        period_type=period_type,
-    )
-    return obj
-
+    return (year - 1 if quarter == 4 else year, quarter, period_type)
 
-def get_or_create_metric(name: str, category_code: str) -> Metric:
-    category = MetricCategory.objects.get(code=category_code)
-    code = normalize_code(name)
-
-    metric, _ = Metric.objects.get_or_create(
-        code=code,
-        defaults={
-            "name": name,
-            "category": category,
-        },
-    )
-    return metric
 
+def resolve_metrics(names) -> dict:
+    """
+    {(name, category_code): Metric} for every pair in ``names``, looked up
+    by normalized code. Missing metrics are created with one insert.
+    """
+    by_code = {}
+    for name, category_code in names:
+        by_code.setdefault(normalize_code(name), (name, category_code))
+
+    metrics = Metric.objects.in_bulk(list(by_code), field_name="code")
+    missing = [code for code in by_code if code not in metrics]
+    if missing:
+        categories = MetricCategory.objects.in_bulk(field_name="code")
+        Metric.objects.bulk_create(
+            [
+                Metric(code=code, name=by_code[code][0], category=categories[by_code[code][1]])
+                for code in missing
+            ],
+            ignore_conflicts=True,
+        )
+        # ignore_conflicts doesn't return pks, and another import may have won
+        metrics.update(Metric.objects.in_bulk(missing, field_name="code"))
+
+    return {(name, category_code): metrics[normalize_code(name)] for name, category_code in names}
+
+
+def resolve_time_periods(keys) -> dict:
+    """
+    {(year, quarter, period_type): TimePeriod} for every key. Missing
+    periods are created with one insert.
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+
+    periods = {
+        (p.year, p.quarter, p.period_type): p
+        for p in TimePeriod.objects.filter(
+            year__in={year for year, _, _ in keys},
+            period_type__in={period_type for _, _, period_type in keys},
+        )
+    }
+    missing = [
+        TimePeriod(year=year, quarter=quarter, period_type=period_type)
+        for year, quarter, period_type in keys
+        if (year, quarter, period_type) not in periods
+    ]
+    # Annual periods have a NULL quarter, which the unique constraint doesn't
+    # cover, so these are plain inserts checked against the lookup above.
+    for period in TimePeriod.objects.bulk_create(missing):
+        periods[(period.year, period.quarter, period.period_type)] = period
+    return periods
 
 
 SECTION_MAP = {
-    "PROFIT & LOSS": {"category": "PNL", "report_type": "annual"},
-    "QUARTERS": {"category": "PNL", "report_type": "quarterly"},
-    "BALANCE SHEET": {"category": "BS", "report_type": "annual"},
-    "CASH FLOW:": {"category": "CF", "report_type": "annual"},
+    "PROFIT & LOSS": {"code": "pnl", "category": "PNL", "report_type": "annual"},
+    "QUARTERS": {"code": "quarterly", "category": "PNL", "report_type": "quarterly"},
+    "BALANCE SHEET": {"code": "bs", "category": "BS", "report_type": "annual"},
+    "CASH FLOW:": {"code": "cf", "category": "CF", "report_type": "annual"},
 }
 
 IGNORED_SECTIONS = {
@@ -89,89 +140,253 @@ IGNORED_SECTIONS = {
     "TRENDS",
 }
 
-@transaction.atomic
-def import_data_sheet(
-    file_path: str,
-    company_ticker: str,
-):
+def _cell_label(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _numeric(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if math.isnan(value) else value
+    if isinstance(value, Decimal):
+        return value
+    return None
+
+
+def parse_data_sheet(file_path: str):
     """
-    Imports RAW financial data from the Excel Data Sheet
-    and regenerates CompanyFundamental after import.
+    Streams the Excel Data Sheet row by row (openpyxl read-only mode, so
+    memory stays flat however wide the workbook is) and yields a
+    DataSheetRecord for every numeric cell of the raw statements.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        current_section = None
+        current_periods = []
+
+        for row in wb["Data Sheet"].iter_rows(values_only=True):
+            if not row:
+                continue
+            first_cell = _cell_label(row[0])
+
+            if not first_cell:
+                continue
+
+            cell_upper = first_cell.upper()
+
+            if cell_upper in IGNORED_SECTIONS:
+                current_section = None
+                continue
+
+            if cell_upper in SECTION_MAP:
+                current_section = SECTION_MAP[cell_upper]
+                current_periods = []
+                continue
+
+            if cell_upper == "REPORT DATE" and current_section:
+                current_periods = row[1:]
+                continue
+
+            if current_section and current_periods:
+                if cell_upper == "TOTAL":
+                    continue
+
+                for period_label, value in zip(current_periods, row[1:]):
+                    if not is_valid_period(period_label):
+                        continue
+
+                    value = _numeric(value)
+                    if value is None:
+                        continue
+
+                    yield DataSheetRecord(current_section, first_cell, period_label, value)
+    finally:
+        wb.close()
+
+
+def quantize_value(value) -> Decimal:
+    # Same precision FinancialValue.value stores, so comparisons are exact
+    return Decimal(str(value)).quantize(VALUE_QUANTUM)
+
+
+def section_digest(records) -> str:
+    """
+    Order-independent SHA-256 of a section's (metric, period, value) cells.
     """
+    digest = hashlib.sha256()
+    lines = sorted(
+        f"{r.metric}\t{r.period.isoformat()}\t{quantize_value(r.value)}"
+        for r in records
+    )
+    for line in lines:
+        digest.update(line.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
 
+def write_financial_values(company: Company, records, force: bool = False) -> int:
+    """
+    Upserts parsed Data Sheet records for the company.
+
+    Sections whose content hash matches the last import are skipped
+    (unless ``force``), and of the rest only cells whose stored value
+    differs are written, with one INSERT ... ON CONFLICT per batch.
+    Returns the number of cells written.
+    """
+    by_section = defaultdict(list)
+    for record in records:
+        by_section[record.section["code"]].append(record)
+    digests = {code: section_digest(rows) for code, rows in by_section.items()}
+
+    changed_sections = list(digests)
+    if not force:
+        stored = dict(
+            ImportFingerprint.objects
+            .filter(company=company, section__in=digests)
+            .values_list("section", "digest")
+        )
+        changed_sections = [code for code in digests if stored.get(code) != digests[code]]
+    if not changed_sections:
+        return 0
+
+    records = [
+        (r.section["category"], r.metric, period_key(r.period, r.section["report_type"]), r.value)
+        for code in changed_sections
+        for r in by_section[code]
+    ]
+
+    metrics = resolve_metrics({(metric_name, category) for category, metric_name, _, _ in records})
+    periods = resolve_time_periods({key for _, _, key, _ in records})
+
+    # Later cells win, as they did with update_or_create; Postgres also
+    # rejects an upsert that touches the same row twice.
+    values = {}
+    for category, metric_name, key, value in records:
+        values[(metrics[(metric_name, category)].pk, periods[key].pk)] = quantize_value(value)
+
+    existing = {
+        (metric_id, period_id): value
+        for metric_id, period_id, value in FinancialValue.objects.filter(
+            company=company,
+            metric_id__in={metric_id for metric_id, _ in values},
+            time_period_id__in={period_id for _, period_id in values},
+        ).values_list("metric_id", "time_period_id", "value")
+    }
+    changed = {key: value for key, value in values.items() if existing.get(key) != value}
+
+    FinancialValue.objects.bulk_create(
+        [
+            FinancialValue(company=company, metric_id=metric_id, time_period_id=period_id, value=value)
+            for (metric_id, period_id), value in changed.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["company", "metric", "time_period"],
+        update_fields=["value"],
+        batch_size=IMPORT_BATCH_SIZE,
+    )
+    ImportFingerprint.objects.bulk_create(
+        [
+            ImportFingerprint(company=company, section=code, digest=digests[code])
+            for code in changed_sections
+        ],
+        update_conflicts=True,
+        unique_fields=["company", "section"],
+        update_fields=["digest", "updated_at"],
+    )
+    if changed:
+        # bulk_create skips post_save, so invalidate cached pages and mark
+        # the fundamentals stale explicitly
+        bump_company_version(company.pk)
+        mark_fundamentals_dirty([company.pk])
+    return len(changed)
+
+
+def get_or_create_import_company(company_ticker: str) -> Company:
     company, _ = Company.objects.get_or_create(
         ticker=company_ticker,
         defaults={
             "name": company_ticker,
             "exchange": "nse",
             "sector": "Unknown",
-            "industry": "Unknown",
-            "listing_date": "2000-01-01",
             "is_active": True,
         },
     )
+    return company
 
-    df = pd.read_excel(
-        file_path,
-        sheet_name="Data Sheet",
-        header=None,
-        engine="openpyxl",
-        engine_kwargs={"data_only": True},
-    )
-
-    current_section = None
-    current_periods = []
 
-    for i in range(len(df)):
-        first_cell = str(df.iloc[i, 0]).strip()
-
-        if not first_cell or first_cell == "nan":
-            continue
-
-        cell_upper = first_cell.upper()
-
-        if cell_upper in IGNORED_SECTIONS:
-            current_section = None
-            continue
-
-        if cell_upper in SECTION_MAP:
-            current_section = SECTION_MAP[cell_upper]
-            current_periods = []
-            continue
-
-        if cell_upper == "REPORT DATE" and current_section:
-            current_periods = df.iloc[i, 1:].tolist()
-            continue
+@transaction.atomic
+def import_data_sheet(
+    file_path: str,
+    company_ticker: str,
+    force: bool = False,
+):
+    """
+    Imports RAW financial data from the Excel Data Sheet
+    and recomputes CompanyFundamental if any value changed.
+    """
 
-        if current_section and current_periods:
-            metric_name = first_cell
+    company = get_or_create_import_company(company_ticker)
 
-            if metric_name.upper() == "TOTAL":
-                continue
+    if write_financial_values(company, parse_data_sheet(file_path), force=force):
+        recompute_dirty_fundamentals([company.pk])
+    return company
 
-            metric = get_or_create_metric(
-                metric_name,
-                current_section["category"],
-            )
 
-            for col_idx, period_label in enumerate(current_periods):
-                if not is_valid_period(period_label):
-                    continue
+def _parse_workbook(file_path: str):
+    # Runs in a worker process: parsing only, no database access
+    started = time.perf_counter()
+    records = list(parse_data_sheet(file_path))
+    return records, time.perf_counter() - started
 
-                value = df.iloc[i, col_idx + 1]
 
-                if value is None or pd.isna(value):
-                    continue
+def import_data_sheets(jobs, workers=None, force=False):
+    """
+    Imports many (file_path, company_ticker) pairs. Workbooks are parsed in
+    a process pool while this process writes each company in its own
+    transaction as results arrive; fundamentals are regenerated once at the
+    end for the companies whose values changed.
 
-                time_period = get_or_create_time_period(
-                    period_label,
-                    current_section["report_type"],
-                )
-
-                FinancialValue.objects.update_or_create(
-                    company=company,
-                    metric=metric,
-                    time_period=time_period,
-                    defaults={"value": value},
-                )
-    generate_company_fundamentals(company)
+    Returns one report dict per job with status, cell count, parse/write
+    timings and the error message of failed imports.
+    """
+    jobs = list(jobs)
+    reports = []
+    imported = []
+
+    # Forked workers inherit Django's state (and the open DB socket, which
+    # they never touch and which os._exit at worker shutdown leaves alone).
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    with pool:
+        futures = {
+            pool.submit(_parse_workbook, file_path): (file_path, ticker)
+            for file_path, ticker in jobs
+        }
+        for future in as_completed(futures):
+            file_path, ticker = futures[future]
+            report = {
+                "file": str(file_path),
+                "ticker": ticker,
+                "status": "ok",
+                "values": 0,
+                "parse_seconds": None,
+                "write_seconds": None,
+                "error": "",
+            }
+            try:
+                records, report["parse_seconds"] = future.result()
+                started = time.perf_counter()
+                with transaction.atomic():
+                    company = get_or_create_import_company(ticker)
+                    report["values"] = write_financial_values(company, records, force=force)
+                report["write_seconds"] = time.perf_counter() - started
+                if report["values"]:
+                    imported.append(company)
+            except Exception as e:
+                report["status"] = "failed"
+                report["error"] = f"{type(e).__name__}: {e}"
+            reports.append(report)
+
+    if imported:
+        recompute_dirty_fundamentals([company.pk for company in imported])
+    return reports
@@ -0,0 +1,197 @@
+import json
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+import yfinance as yf
+from django.conf import settings
+
+from stocks.utils.circuit_breaker import CircuitBreaker
+
+
+Quote = namedtuple("Quote", ["date", "close", "volume"])
+
+HISTORY_COLUMNS = ["Close", "Volume"]
+
+
+class MarketDataProvider(ABC):
+    """
+    Source of prices and company info. Symbols are provider symbols
+    (e.g. "SBIN.NS", "^NSEI"); callers own the ticker -> symbol mapping.
+    """
+
+    @abstractmethod
+    def history(self, symbol: str, start=None):
+        """
+        Daily bars from ``start`` (a date, or None for everything) as a
+        DataFrame indexed by date with at least Close and Volume columns.
+        """
+
+    @abstractmethod
+    def latest_quotes(self, symbols):
+        """
+        {symbol: Quote} with the latest complete daily bar of each symbol.
+        Symbols without data are left out.
+        """
+
+    @abstractmethod
+    def info(self, symbol: str) -> dict:
+        """
+        Fundamentals/valuation info in yfinance's ``Ticker.info`` shape
+        (marketCap, trailingPE, priceToBook, fiftyTwoWeekHigh, ...).
+        """
+
+
+def _last_quote(frame):
+    frame = frame.dropna(subset=["Close"])
+    if frame.empty:
+        return None
+    last = frame.iloc[-1]
+    volume = last.get("Volume")
+    return Quote(
+        date=pd.Timestamp(frame.index[-1]).date(),
+        close=float(last["Close"]),
+        volume=0 if volume is None or pd.isna(volume) else int(volume),
+    )
+
+
+class YFinanceProvider(MarketDataProvider):
+
+    # Enough trading days to find the last bar across weekends and holidays
+    QUOTE_PERIOD = "5d"
+
+    def history(self, symbol, start=None):
+        stock = yf.Ticker(symbol)
+        if start is None:
+            return stock.history(period="max")
+        return stock.history(start=str(start))
+
+    def latest_quotes(self, symbols):
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        df = yf.download(
+            symbols,
+            period=self.QUOTE_PERIOD,
+            group_by="ticker",
+            auto_adjust=True,
+            threads=True,
+            progress=False,
+        )
+        if df.empty:
+            return {}
+        if not isinstance(df.columns, pd.MultiIndex):
+            df = pd.concat({symbols[0]: df}, axis=1)
+
+        quotes = {}
+        for symbol in df.columns.get_level_values(0).unique():
+            quote = _last_quote(df[symbol])
+            if quote:
+                quotes[symbol] = quote
+        return quotes
+
+    def info(self, symbol):
+        return yf.Ticker(symbol).info
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded data from disk, for deterministic tests and ingestion
+    benchmarks without network access. Layout under ``root``::
+
+        history/<symbol>.csv   (Date, Close, Volume, ...)
+        info/<symbol>.json
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def history(self, symbol, start=None):
+        path = self.root / "history" / f"{symbol}.csv"
+        if not path.exists():
+            return pd.DataFrame(columns=HISTORY_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+
+        df = pd.read_csv(path, index_col="Date")
+        df.index = pd.to_datetime(df.index)
+        if df.index.tz is not None:
+            # Keep exchange-local wall time, like the dates yfinance reports
+            df.index = df.index.tz_localize(None)
+        df = df.sort_index()
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        return df
+
+    def latest_quotes(self, symbols):
+        quotes = {}
+        for symbol in symbols:
+            quote = _last_quote(self.history(symbol))
+            if quote:
+                quotes[symbol] = quote
+        return quotes
+
+    def info(self, symbol):
+        path = self.root / "info" / f"{symbol}.json"
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text())
+
+    def record(self, symbol, history=None, info=None):
+        """
+        Stores fetched data in the replay layout, e.g. to capture fixtures
+        from YFinanceProvider.
+        """
+        if history is not None:
+            path = self.root / "history" / f"{symbol}.csv"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            history.rename_axis("Date").to_csv(path)
+        if info is not None:
+            path = self.root / "info" / f"{symbol}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(info, default=str))
+
+
+PROVIDERS = {
+    "yfinance": lambda: YFinanceProvider(),
+    "replay": lambda: ReplayProvider(settings.MARKET_DATA_REPLAY_DIR),
+}
+
+
+BREAKER_KEY = "stocks:breaker:market_data"
+
+
+class GuardedProvider(MarketDataProvider):
+    """
+    Routes every call of ``provider`` through a circuit breaker. While the
+    source keeps failing, calls raise CircuitOpenError without touching the
+    network.
+    """
+
+    def __init__(self, provider, breaker):
+        self.provider = provider
+        self.breaker = breaker
+
+    def history(self, symbol, start=None):
+        return self.breaker.call(self.provider.history, symbol, start=start)
+
+    def latest_quotes(self, symbols):
+        return self.breaker.call(self.provider.latest_quotes, symbols)
+
+    def info(self, symbol):
+        return self.breaker.call(self.provider.info, symbol)
+
+
+def get_breaker() -> CircuitBreaker:
+    """
+    Breaker shared by all market data calls, configured by
+    settings.MARKET_DATA_BREAKER.
+    """
+    return CircuitBreaker(BREAKER_KEY, **settings.MARKET_DATA_BREAKER)
+
+
+def get_provider() -> MarketDataProvider:
+    """
+    Provider selected by settings.MARKET_DATA_PROVIDER, behind the shared
+    circuit breaker.
+    """
+    return GuardedProvider(PROVIDERS[settings.MARKET_DATA_PROVIDER](), get_breaker())
@@ -1,44 +1,190 @@
-import yfinance as yf
-from stocks.models import Company, CompanyMarketSnapshot, CompanyHistory
-from datetime import date
+import logging
+from django.db import transaction
+from django.utils import timezone
+from stocks.models import Company, CompanyMarketSnapshot, CompanyHistory, SnapshotRun
+from stocks.utils.company_cache import bump_company_version
+from stocks.utils.market_data import get_provider
 from decimal import Decimal
 
-def get_live_snapshot(company: Company):
-    try:
-        stock = yf.Ticker(f"{company.ticker}.NS")
-        df = stock.history(period="1d")
-        if df.empty:
-            return
-        price = Decimal(df["Close"].iloc[-1])
-        volume = int(df["Volume"].iloc[-1])
-        CompanyMarketSnapshot.objects.update_or_create(
-            company=company,
-            defaults={
-                "price": price,
-            }
-        )
-        CompanyHistory.objects.update_or_create(
-            company=company,
-            date=date.today(),
-            defaults={
-                "closing_price": price,
-                "volume": volume,
-            }
-        )
-    except Exception as e:
-        print(f"Failed for {company.ticker}: {e}")
+logger = logging.getLogger(__name__)
 
-def get_weekly_updates(company: Company):
-    stock = yf.Ticker(f"{company.ticker}.NS")
-    info = stock.info
+# Tickers per provider call / Celery task in the daily snapshot
+SNAPSHOT_BATCH_SIZE = 100
+# Tickers per Celery task in the weekly update, one info request each
+WEEKLY_BATCH_SIZE = 25
 
+def get_live_snapshot(company: Company) -> bool:
+    """
+    Stores the latest quote of one company. Returns False when the provider
+    has no data for it; provider errors propagate so the caller can retry.
+    """
+    symbol = f"{company.ticker}.NS"
+    quote = get_provider().latest_quotes([symbol]).get(symbol)
+    if quote is None:
+        return False
+    price = Decimal(quote.close)
+    volume = quote.volume
     CompanyMarketSnapshot.objects.update_or_create(
         company=company,
         defaults={
-            "market_cap": info.get("marketCap"),
-            "pe": info.get("trailingPE"),
-            "pb": info.get("priceToBook"),
-            "high_52w": info.get("fiftyTwoWeekHigh"),
-            "low_52w": info.get("fiftyTwoWeekLow"),
+            "price": price,
+        }
+    )
+    CompanyHistory.objects.update_or_create(
+        company=company,
+        date=quote.date,
+        defaults={
+            "closing_price": price,
+            "volume": volume,
         }
     )
+    return True
+
+def get_live_snapshots(companies):
+    """
+    Batched get_live_snapshot: fetches the latest quote for all
+    ``companies`` in one provider call and upserts their
+    CompanyMarketSnapshot and CompanyHistory rows with one statement per
+    table.
+
+    Returns {"updated": [tickers], "failed": {ticker: reason}}.
+    """
+    by_symbol = {f"{c.ticker}.NS": c for c in companies}
+    report = {"updated": [], "failed": {}}
+    if not by_symbol:
+        return report
+
+    # A failure of the whole download propagates so the task can retry it
+    quotes = get_provider().latest_quotes(list(by_symbol))
+
+    now = timezone.now()
+    snapshots, history = [], []
+    for symbol, company in by_symbol.items():
+        quote = quotes.get(symbol)
+        if quote is None:
+            report["failed"][company.ticker] = "no data returned"
+            continue
+        price = Decimal(quote.close)
+
+        snapshots.append(CompanyMarketSnapshot(company=company, price=price, updated_at=now))
+        history.append(CompanyHistory(company=company, date=quote.date, closing_price=price, volume=quote.volume))
+        report["updated"].append(company.ticker)
+
+    with transaction.atomic():
+        CompanyMarketSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=["company"],
+            update_fields=["price", "updated_at"],
+        )
+        CompanyHistory.objects.bulk_create(
+            history,
+            update_conflicts=True,
+            unique_fields=["company", "date"],
+            update_fields=["closing_price", "volume"],
+        )
+        for snapshot in snapshots:
+            bump_company_version(snapshot.company_id)
+
+    for ticker, reason in report["failed"].items():
+        logger.warning("Snapshot failed for %s: %s", ticker, reason)
+    return report
+
+
+def finish_run(run: SnapshotRun, reports) -> list:
+    """
+    Totals the chunk reports of a daily snapshot run into ``run`` and marks
+    it finished. The first ``run.chunks`` reports are company chunks, the
+    rest indices. Every updated company writes a snapshot and a history
+    row, every updated index a history row.
+
+    Returns the tickers of the updated companies.
+    """
+    company_reports, index_reports = reports[:run.chunks], reports[run.chunks:]
+    updated = [ticker for report in company_reports for ticker in report["updated"]]
+
+    run.companies_updated = len(updated)
+    run.companies_failed = sum(len(report["failed"]) for report in company_reports)
+    run.indices_updated = sum(len(report["updated"]) for report in index_reports)
+    run.indices_failed = sum(len(report["failed"]) for report in index_reports)
+    run.rows_written = 2 * run.companies_updated + run.indices_updated
+    run.status = "finished"
+    run.finished_at = timezone.now()
+    run.save()
+
+    logger.info(
+        "Snapshot run %s finished in %s: %d/%d companies, %d/%d indices",
+        run.pk, run.duration,
+        run.companies_updated, run.companies_updated + run.companies_failed,
+        run.indices_updated, run.indices_updated + run.indices_failed,
+    )
+    return updated
+
+
+# CompanyMarketSnapshot field -> provider info key, refreshed weekly
+WEEKLY_FIELDS = {
+    "market_cap": "marketCap",
+    "pe": "trailingPE",
+    "pb": "priceToBook",
+    "high_52w": "fiftyTwoWeekHigh",
+    "low_52w": "fiftyTwoWeekLow",
+}
+
+
+def _weekly_value(field, value):
+    # yfinance reports "Infinity" for some ratios, and a PE or PB can outgrow
+    # its column; either would make the whole chunk's bulk update fail, so
+    # such values are left empty
+    field = CompanyMarketSnapshot._meta.get_field(field)
+    if value is None:
+        return None
+    try:
+        value = Decimal(str(value)).quantize(Decimal(1).scaleb(-field.decimal_places))
+    except ArithmeticError:
+        return None
+    if not value.is_finite() or abs(value) >= 10 ** (field.max_digits - field.decimal_places):
+        return None
+    return value
+
+
+def get_weekly_snapshots(companies):
+    """
+    Refreshes the weekly valuation fields of ``companies``: fetches each
+    company's info with no transaction open, then writes all of them with
+    one bulk update. A failed fetch only fails its own company. Companies
+    without a price snapshot yet are skipped, since a snapshot row needs a
+    price.
+
+    Returns {"updated": [tickers], "failed": {ticker: reason}}.
+    """
+    report = {"updated": [], "failed": {}}
+    snapshots = {
+        snapshot.company_id: snapshot
+        for snapshot in CompanyMarketSnapshot.objects.filter(company__in=companies)
+    }
+    provider = get_provider()
+    now = timezone.now()
+    updated = []
+    for company in companies:
+        snapshot = snapshots.get(company.pk)
+        if snapshot is None:
+            continue
+        try:
+            info = provider.info(f"{company.ticker}.NS")
+        except Exception as e:
+            report["failed"][company.ticker] = str(e)
+            continue
+        for field, key in WEEKLY_FIELDS.items():
+            setattr(snapshot, field, _weekly_value(field, info.get(key)))
+        snapshot.updated_at = now
+        updated.append(snapshot)
+        report["updated"].append(company.ticker)
+
+    with transaction.atomic():
+        CompanyMarketSnapshot.objects.bulk_update(updated, [*WEEKLY_FIELDS, "updated_at"])
+        for snapshot in updated:
+            bump_company_version(snapshot.company_id)
+
+    for ticker, reason in report["failed"].items():
+        logger.warning("Weekly update failed for %s: %s", ticker, reason)
+    return report
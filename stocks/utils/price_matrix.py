@@ -0,0 +1,365 @@
+import json
+import os
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from stocks.models import Company, CompanyHistory, Index, IndexHistory
+
+
+META_FILE = "meta.json"
+CLOSE_FILE = "close.f64"
+VOLUME_FILE = "volume.f64"
+INDEX_CLOSE_FILE = "index_close.f64"
+
+CHUNK_SIZE = 50_000
+
+# Calendar days before the last exported day whose history an incremental
+# build compares again; changes older than that need a full rebuild
+RECHECK_DAYS = 30
+
+# Arrays are stored column-major (one trading day per contiguous column), so
+# appending days only ever appends to the end of each file.
+ORDER = "F"
+
+
+def _path(path=None) -> Path:
+    return Path(path or settings.PRICE_MATRIX_DIR)
+
+
+def _open(path: Path, name: str, rows: int, days: int, mode: str):
+    if rows == 0 or days == 0:
+        # mmap can't map an empty file
+        return np.empty((rows, days), dtype=np.float64, order=ORDER)
+    return np.memmap(path / name, dtype=np.float64, mode=mode, shape=(rows, days), order=ORDER)
+
+
+def _resize(path: Path, name: str, rows: int, days: int):
+    """
+    Grows (or creates) a matrix file to ``days`` columns, filling new cells
+    with NaN. Existing columns are left untouched.
+    """
+    file = path / name
+    old_size = file.stat().st_size if file.exists() else 0
+    new_size = rows * days * np.dtype(np.float64).itemsize
+    with open(file, "ab") as f:
+        f.truncate(new_size)
+    if new_size > old_size and rows:
+        flat = np.memmap(file, dtype=np.float64, mode="r+")
+        flat[old_size // flat.itemsize:] = np.nan
+        flat.flush()
+
+
+def _fill(matrices, row_of, col_of, rows):
+    """
+    Scatters (key, date, value, ...) rows into ``matrices`` (one per value
+    column) in chunks, so only CHUNK_SIZE Python tuples are alive at a time.
+    """
+    keys, cols = [], []
+    values = [[] for _ in matrices]
+
+    def flush():
+        if keys:
+            r, c = np.array(keys), np.array(cols)
+            for matrix, column in zip(matrices, values):
+                matrix[r, c] = np.array(column, dtype=np.float64)
+                column.clear()
+            keys.clear()
+            cols.clear()
+
+    for key, day, *row_values in rows:
+        # Rows written since the dates were collected wait for the next build
+        if key not in row_of or day not in col_of:
+            continue
+        keys.append(row_of[key])
+        cols.append(col_of[day])
+        for column, value in zip(values, row_values):
+            column.append(np.nan if value is None else value)
+        if len(keys) >= CHUNK_SIZE:
+            flush()
+    flush()
+
+
+def _file(generation: str, name: str) -> str:
+    # A full rebuild writes a new generation of files next to the old one
+    return f"{generation}.{name}" if generation else name
+
+
+def _capacity(rows: int) -> int:
+    # Spare rows let new companies and indices be added in place: with one
+    # contiguous column per day, adding a row would otherwise move every cell
+    return rows + max(rows // 4, 16)
+
+
+def _day_digests(since=None):
+    """
+    {date: digest} of every day with history (from ``since`` on), from two
+    grouped queries. The digest changes whenever a row of that day is added,
+    removed or edited, so comparing it with the exported one finds
+    backfilled days.
+    """
+    company_history = CompanyHistory.objects.order_by()
+    index_history = IndexHistory.objects.order_by()
+    if since:
+        company_history = company_history.filter(date__gte=since)
+        index_history = index_history.filter(date__gte=since)
+
+    digests = {}
+    company_days = (
+        company_history.values("date")
+        .annotate(rows=Count("id"), close=Sum("closing_price"), volume=Sum("volume"))
+    )
+    for day in company_days:
+        digests[day["date"]] = f"{day['rows']}:{day['close']}:{day['volume']}"
+    index_days = index_history.values("date").annotate(rows=Count("id"), value=Sum("value"))
+    for day in index_days:
+        digests[day["date"]] = f"{digests.get(day['date'], '')}|{day['rows']}:{day['value']}"
+    return digests
+
+
+def _write(path: Path, generation, capacity, companies, indices, dates, company_history, index_history):
+    """
+    Scatters the given history rows into the matrix files, at the rows of
+    ``companies`` and ``indices`` and the columns of ``dates``.
+    """
+    col_of = {d: i for i, d in enumerate(dates)}
+    company_row = {pk: i for i, (pk, _) in enumerate(companies)}
+    index_row = {pk: i for i, (pk, _) in enumerate(indices)}
+    company_rows, index_rows = capacity
+
+    close = _open(path, _file(generation, CLOSE_FILE), company_rows, len(dates), "r+")
+    volume = _open(path, _file(generation, VOLUME_FILE), company_rows, len(dates), "r+")
+    _fill(
+        (close, volume), company_row, col_of,
+        company_history.order_by().values_list("company_id", "date", "closing_price", "volume")
+        .iterator(chunk_size=CHUNK_SIZE),
+    )
+
+    index_close = _open(path, _file(generation, INDEX_CLOSE_FILE), index_rows, len(dates), "r+")
+    _fill(
+        (index_close,), index_row, col_of,
+        index_history.order_by().values_list("index_id", "date", "value").iterator(chunk_size=CHUNK_SIZE),
+    )
+
+    for matrix in (close, volume, index_close):
+        if isinstance(matrix, np.memmap):
+            matrix.flush()
+
+
+def _write_meta(path: Path, generation, capacity, companies, indices, dates, digests):
+    # Written last and swapped in atomically: readers only ever see a shape
+    # the data files already cover.
+    tmp = path / (META_FILE + ".tmp")
+    tmp.write_text(json.dumps({
+        "generation": generation,
+        "capacity": capacity,
+        "companies": companies,
+        "indices": indices,
+        "dates": [d.isoformat() for d in dates],
+        "digests": [digests[d] for d in dates],
+    }))
+    os.replace(tmp, path / META_FILE)
+
+
+def _read_meta(path: Path):
+    try:
+        return json.loads((path / META_FILE).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _changed_from(meta, dates, digests) -> int:
+    """
+    Position of the first exported day whose rows changed since ``meta``
+    was written; days from there on have to be re-read.
+    """
+    exported = list(zip(meta["dates"], meta["digests"]))
+    current = [(d.isoformat(), digests[d]) for d in dates]
+    for position, (old, new) in enumerate(zip(exported, current)):
+        if old != new:
+            return position
+    return min(len(exported), len(current))
+
+
+def _files(capacity):
+    company_rows, index_rows = capacity
+    return ((CLOSE_FILE, company_rows), (VOLUME_FILE, company_rows), (INDEX_CLOSE_FILE, index_rows))
+
+
+def _extends(meta, companies, indices) -> bool:
+    """
+    Whether the export in ``meta`` can be updated in place: every exported
+    company and index is still there in the same position, and the new ones
+    fit in the spare rows.
+    """
+    if meta is None or "capacity" not in meta:
+        return False
+    company_rows, index_rows = meta["capacity"]
+    return (
+        companies[:len(meta["companies"])] == meta["companies"]
+        and indices[:len(meta["indices"])] == meta["indices"]
+        and len(companies) <= company_rows
+        and len(indices) <= index_rows
+    )
+
+
+def _rebuild(path: Path, companies, indices):
+    # Written as a new generation of files, and meta.json is only swapped
+    # over once they are complete
+    generation = uuid.uuid4().hex[:12]
+    capacity = [_capacity(len(companies)), _capacity(len(indices))]
+    digests = _day_digests()
+    dates = sorted(digests)
+
+    for name, rows in _files(capacity):
+        _resize(path, _file(generation, name), rows, len(dates))
+    _write(path, generation, capacity, companies, indices, dates, CompanyHistory.objects, IndexHistory.objects)
+    _write_meta(path, generation, capacity, companies, indices, dates, digests)
+
+    # Readers that already mapped the old files keep their pages
+    for old in path.glob("*.f64"):
+        if not old.name.startswith(f"{generation}."):
+            old.unlink(missing_ok=True)
+    return len(dates)
+
+
+def _update(path: Path, meta, companies, indices):
+    generation, capacity = meta["generation"], meta["capacity"]
+    exported = [date.fromisoformat(d) for d in meta["dates"]]
+    since = exported[-1] - timedelta(days=RECHECK_DAYS) if exported else None
+
+    # Days before the recheck window keep their exported digests
+    digests = {d: digest for d, digest in zip(exported, meta["digests"]) if since and d < since}
+    digests.update(_day_digests(since))
+    dates = sorted(digests)
+
+    new_company_ids = [pk for pk, _ in companies[len(meta["companies"]):]]
+    new_index_ids = [pk for pk, _ in indices[len(meta["indices"]):]]
+    if since and (new_company_ids or new_index_ids):
+        # A new row's days before the window must already be exported
+        # columns; inserting a column would move every later one
+        older = set(
+            CompanyHistory.objects.filter(company_id__in=new_company_ids, date__lt=since)
+            .order_by().values_list("date", flat=True).distinct()
+        ) | set(
+            IndexHistory.objects.filter(index_id__in=new_index_ids, date__lt=since)
+            .order_by().values_list("date", flat=True).distinct()
+        )
+        if not older <= digests.keys():
+            return _rebuild(path, companies, indices)
+
+    kept = _changed_from(meta, dates, digests)
+    for name, rows in _files(capacity):
+        name = _file(generation, name)
+        _resize(path, name, rows, len(dates))
+        if kept < len(dates):
+            # Changed days are re-read, so clear them before refilling
+            matrix = _open(path, name, rows, len(dates), "r+")
+            matrix[:, kept:] = np.nan
+            if isinstance(matrix, np.memmap):
+                matrix.flush()
+
+    if new_company_ids or new_index_ids:
+        # New rows need their whole history, not only the re-read days
+        _write(
+            path, generation, capacity, companies, indices, dates,
+            CompanyHistory.objects.filter(company_id__in=new_company_ids),
+            IndexHistory.objects.filter(index_id__in=new_index_ids),
+        )
+    if kept < len(dates):
+        _write(
+            path, generation, capacity, companies, indices, dates,
+            CompanyHistory.objects.filter(date__gte=dates[kept]), IndexHistory.objects.filter(date__gte=dates[kept]),
+        )
+    _write_meta(path, generation, capacity, companies, indices, dates, digests)
+    return len(dates) - kept
+
+
+def build_price_matrix(path=None, full=False):
+    """
+    Exports closing prices and volumes of every company (and index closes)
+    into companies x trading-days matrices under ``path``.
+
+    Unless ``full`` is set, the existing export is updated in place: only
+    days in the last RECHECK_DAYS before the last exported one are compared
+    again (see _day_digests), and from the earliest of those that changed
+    on the days are re-read. New companies and indices fill spare rows.
+    Removed companies or indices, running out of spare rows, or a new
+    row with days the export lacks before the window force a full rebuild.
+    A full rebuild writes a new generation of files and only then swaps
+    meta.json over, so readers never see the files change under the shape
+    they read. Returns the number of days written.
+    """
+    path = _path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    companies = [list(row) for row in Company.objects.order_by("id").values_list("id", "ticker")]
+    indices = [list(row) for row in Index.objects.order_by("id").values_list("id", "ticker")]
+
+    meta = _read_meta(path)
+    if not full and _extends(meta, companies, indices):
+        return _update(path, meta, companies, indices)
+    return _rebuild(path, companies, indices)
+
+
+class PriceMatrix:
+    """
+    Read-only, memory-mapped view of an exported price matrix.
+
+    ``close`` and ``volume`` are (companies x days) arrays and
+    ``index_close`` is (indices x days); missing observations are NaN.
+    """
+
+    def __init__(self, path=None):
+        path = _path(path)
+        try:
+            self._load(path)
+        except FileNotFoundError:
+            # A full rebuild replaced the files between reading meta.json and
+            # mapping them; the new meta.json describes the new ones
+            self._load(path)
+
+    def _load(self, path: Path):
+        meta = _read_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"No price matrix at {path}")
+        generation = meta.get("generation", "")
+        company_rows, index_rows = meta.get("capacity", [len(meta["companies"]), len(meta["indices"])])
+
+        self.company_ids = np.array([pk for pk, _ in meta["companies"]], dtype=np.int64)
+        self.tickers = [ticker for _, ticker in meta["companies"]]
+        self.index_tickers = [ticker for _, ticker in meta["indices"]]
+        self.dates = np.array(meta["dates"], dtype="datetime64[D]")
+
+        # Files hold spare rows for companies and indices added later
+        days, companies, indices = len(self.dates), len(self.tickers), len(self.index_tickers)
+        self.close = _open(path, _file(generation, CLOSE_FILE), company_rows, days, "r")[:companies]
+        self.volume = _open(path, _file(generation, VOLUME_FILE), company_rows, days, "r")[:companies]
+        self.index_close = _open(path, _file(generation, INDEX_CLOSE_FILE), index_rows, days, "r")[:indices]
+
+        self._row = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._index_row = {ticker: i for i, ticker in enumerate(self.index_tickers)}
+
+    def prices(self, ticker: str):
+        return self.close[self._row[ticker]]
+
+    def index_prices(self, ticker: str):
+        return self.index_close[self._index_row[ticker]]
+
+    def returns(self, periods: int = 1):
+        """
+        Simple returns over ``periods`` trading days for every company,
+        shaped like ``close`` with the first ``periods`` columns NaN.
+        """
+        out = np.full(self.close.shape, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:, periods:] = self.close[:, periods:] / self.close[:, :-periods] - 1
+        return out
+
+
+def load_price_matrix(path=None) -> PriceMatrix:
+    return PriceMatrix(path)
@@ -0,0 +1,47 @@
+import time
+
+from django.core.cache import cache
+
+
+class RateLimiter:
+    """
+    Allows ``rate`` acquisitions per second across every process sharing the
+    Django cache. Each second is a bucket of ``rate`` tokens counted with an
+    atomic cache.incr (INCR on Redis), so workers on different hosts draw
+    from the same budget; with LocMemCache the limit is per process.
+    """
+
+    def __init__(self, name: str, rate: float, clock=time.time, sleep=time.sleep):
+        self.name = name
+        self.rate = rate
+        self.clock = clock
+        self.sleep = sleep
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token if one is left in the current second and returns 0,
+        otherwise returns the seconds to wait for the next bucket.
+        """
+        if not self.rate:
+            return 0
+        now = self.clock()
+        key = f"{self.name}:{int(now)}"
+        cache.add(key, 0, 2)
+        try:
+            used = cache.incr(key)
+        except ValueError:
+            # Expired between add and incr: we were at a bucket boundary
+            return 0.01
+        if used <= self.rate:
+            return 0
+        return int(now) + 1 - now
+
+    def acquire(self):
+        """
+        Blocks until a token is available.
+        """
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            self.sleep(wait)
@@ -0,0 +1,191 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+
+from stocks.models import Company
+from stocks.utils.company_cache import bump_cache_version, get_cache_version
+
+
+VERSION_KEY = "stocks:search_index:version"
+MAX_QUERY_LENGTH = 50
+MIN_FUZZY_LENGTH = 4
+
+# Match tiers, best first
+EXACT_TICKER, TICKER_PREFIX, NAME_PREFIX, TOKEN_PREFIX, SUBSTRING, FUZZY = range(6)
+
+IndexedCompany = namedtuple("IndexedCompany", ["id", "ticker", "name"])
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _deletes(word: str):
+    # Single-character deletions, the neighbourhood used for typo matching
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """
+    True if ``a`` and ``b`` differ by at most one insertion, deletion,
+    substitution or adjacent transposition.
+    """
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return (
+            a[i + 1:] == b[i + 1:]
+            or (i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+        )
+    return a[i:] == b[i + 1:]
+
+
+class CompanySearchIndex:
+    """
+    Immutable in-memory index over company tickers and names. Prefix lookups
+    bisect a sorted key list, substring lookups run str.find over one joined
+    string and typo-tolerant lookups go through a single-deletion
+    neighbourhood map, so none of them loop over every company in Python.
+    """
+
+    def __init__(self, companies):
+        self.companies = list(companies)
+        self.lowered = [(c.ticker.lower(), c.name.lower()) for c in self.companies]
+
+        keys = []
+        self.deletes = defaultdict(set)
+        for pos, (ticker, name) in enumerate(self.lowered):
+            keys.append((ticker, pos))
+            for word in {ticker, *tokenize(name)}:
+                keys.append((word, pos))
+                if len(word) >= MIN_FUZZY_LENGTH - 1:
+                    self.deletes[word].add((word, pos))
+                    for variant in _deletes(word):
+                        self.deletes[variant].add((word, pos))
+        keys.sort()
+        self.keys = [k for k, _ in keys]
+        self.positions = [p for _, p in keys]
+
+        # One "ticker\tname" line per company, for substring lookups via str.find
+        self.offsets = []
+        offset = 0
+        for ticker, name in self.lowered:
+            self.offsets.append(offset)
+            offset += len(ticker) + len(name) + 2
+        self.haystack = "".join(f"{ticker}\t{name}\n" for ticker, name in self.lowered)
+
+    def _prefix(self, prefix: str):
+        found = set()
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and self.keys[i].startswith(prefix):
+            found.add(self.positions[i])
+            i += 1
+        return found
+
+    def _substring(self, query: str):
+        found = set()
+        if "\t" in query or "\n" in query:
+            return found
+        start = self.haystack.find(query)
+        while start != -1:
+            pos = bisect_right(self.offsets, start) - 1
+            found.add(pos)
+            next_line = self.offsets[pos + 1] if pos + 1 < len(self.offsets) else len(self.haystack)
+            start = self.haystack.find(query, next_line)
+        return found
+
+    def _fuzzy(self, word: str):
+        found = set()
+        for variant in {word} | _deletes(word):
+            for key, pos in self.deletes.get(variant, ()):
+                if _within_one_edit(word, key):
+                    found.add(pos)
+        return found
+
+    def search(self, query: str, limit: int = 10):
+        query = query.strip().lower()[:MAX_QUERY_LENGTH]
+        words = tokenize(query)
+        if not words:
+            return []
+
+        # Every query word has to match the start of some ticker/name word;
+        # the last one may still be half typed.
+        candidates = None
+        for word in words:
+            matches = self._prefix(word)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+
+        tiers = {}
+        for pos in candidates or ():
+            ticker, name = self.lowered[pos]
+            if ticker == query:
+                tiers[pos] = EXACT_TICKER
+            elif ticker.startswith(query):
+                tiers[pos] = TICKER_PREFIX
+            elif name.startswith(query):
+                tiers[pos] = NAME_PREFIX
+            else:
+                tiers[pos] = TOKEN_PREFIX
+
+        if len(tiers) < limit:
+            for pos in self._substring(query):
+                tiers.setdefault(pos, SUBSTRING)
+
+        if len(tiers) < limit and len(words) == 1 and len(query) >= MIN_FUZZY_LENGTH:
+            for pos in self._fuzzy(words[0]):
+                tiers.setdefault(pos, FUZZY)
+
+        ranked = sorted(
+            tiers,
+            key=lambda pos: (tiers[pos], len(self.lowered[pos][0]), self.lowered[pos][0]),
+        )
+        return [self.companies[pos] for pos in ranked[:limit]]
+
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def build_search_index():
+    companies = (
+        IndexedCompany(*row)
+        for row in Company.objects.order_by("ticker").values_list("id", "ticker", "name")
+    )
+    return CompanySearchIndex(companies)
+
+
+def get_search_index():
+    """
+    Returns this process's index, rebuilding it when another process (or a
+    Company save) has moved the shared version forward.
+    """
+    global _index, _index_version
+    version = get_cache_version(VERSION_KEY)
+    if _index is None or _index_version != version:
+        with _lock:
+            if _index is None or _index_version != version:
+                _index = build_search_index()
+                _index_version = version
+    return _index
+
+
+def invalidate_search_index():
+    bump_cache_version(VERSION_KEY)
+
+
+def search_companies(query: str, limit: int = 10):
+    return get_search_index().search(query, limit)
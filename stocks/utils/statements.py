@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+from stocks.models import Company, FinancialValue, TimePeriod
+
+
+# key -> (period_type, metric category code, number of periods shown)
+STATEMENTS = {
+    "quarterly": ("quarterly", "PNL", 8),
+    "pnl": ("annual", "PNL", 12),
+    "bs": ("annual", "BS", 12),
+    "cf": ("annual", "CF", 12),
+    "ratios": ("annual", "RATIO", 12),
+}
+
+
+def _latest_periods(company: Company, period_types):
+    """
+    Returns {period_type: [TimePeriod, ...]} for the periods the company has
+    values in, newest first. One query regardless of how many types are asked.
+    """
+    periods = defaultdict(list)
+    qs = (
+        TimePeriod.objects
+        .filter(values__company=company, period_type__in=period_types)
+        .distinct()
+        .order_by("-year", "-quarter")
+    )
+    for period in qs:
+        periods[period.period_type].append(period)
+    return periods
+
+
+def get_company_statements(company: Company, keys=None):
+    """
+    Loads the requested statements (default: all of STATEMENTS) for a company
+    in two queries and pivots them into the rows financial_table.html expects.
+
+    Returns {key: (periods, rows)} where periods are sorted chronologically and
+    each row is {"metric": name, "values": [value per period], "growth":
+    [(yoy, qoq) per period]} with the precomputed FinancialGrowth, joined
+    into the same query.
+    """
+    keys = list(keys or STATEMENTS)
+    specs = {key: STATEMENTS[key] for key in keys}
+
+    available = _latest_periods(company, {spec[0] for spec in specs.values()})
+
+    selected = {}
+    for key, (period_type, _, limit) in specs.items():
+        periods = available.get(period_type, [])[:limit]
+        selected[key] = sorted(periods, key=lambda p: (p.year, p.quarter or 0))
+
+    period_ids = {p.id for periods in selected.values() for p in periods}
+    if not period_ids:
+        return {key: ([], []) for key in keys}
+
+    # (category, period_id) -> {metric_id: (value, (yoy, qoq))}, plus names in
+    # metric id order
+    cells = defaultdict(dict)
+    metric_names = {}
+    values = (
+        FinancialValue.objects
+        .filter(
+            company=company,
+            time_period_id__in=period_ids,
+            metric__category__code__in={spec[1] for spec in specs.values()},
+        )
+        .values_list(
+            "metric_id", "metric__name", "metric__category__code", "time_period_id", "value",
+            "growth__yoy", "growth__qoq",
+        )
+        .order_by("metric_id")
+    )
+    for metric_id, metric_name, category_code, period_id, value, yoy, qoq in values:
+        metric_names.setdefault(category_code, {})[metric_id] = metric_name
+        cells[(category_code, period_id)][metric_id] = (value, (yoy, qoq))
+
+    statements = {}
+    for key, (_, category_code, _) in specs.items():
+        periods = selected[key]
+        rows = []
+        for metric_id, metric_name in metric_names.get(category_code, {}).items():
+            present = [cells[(category_code, p.id)] for p in periods]
+            if not any(metric_id in c for c in present):
+                continue
+            cell = [c.get(metric_id, (None, (None, None))) for c in present]
+            rows.append({
+                "metric": metric_name,
+                "values": [value for value, _ in cell],
+                "growth": [growth for _, growth in cell],
+            })
+        statements[key] = (periods, rows)
+    return statements
+
+
+def get_statement(company: Company, key: str):
+    """
+    Returns (periods, rows) for a single statement, e.g. get_statement(c, "bs").
+    """
+    return get_company_statements(company, [key])[key]
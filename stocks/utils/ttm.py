@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from django.db.models import OuterRef, Subquery
+
+from stocks.models import FinancialValue, TimePeriod
+from stocks.utils.company_cache import bump_company_version
+
+# Categories whose quarterly values are flows that add up over a year
+FLOW_CATEGORIES = ["PNL"]
+WINDOW = 4
+BATCH_SIZE = 1000
+
+
+def _sequence(year, quarter):
+    # Consecutive quarters get consecutive numbers across fiscal years
+    return year * 4 + quarter - 1
+
+
+def _from_sequence(sequence):
+    return int(sequence // 4), int(sequence % 4 + 1)
+
+
+def rolling_sums(values, window=WINDOW):
+    """
+    Sums of ``window`` consecutive columns of a 2-D array, NaN unless all of
+    them are present. Column j holds the window ending at column j.
+    """
+    present = ~np.isnan(values)
+    zeros = np.zeros((values.shape[0], 1))
+    totals = np.hstack([zeros, np.cumsum(np.where(present, values, 0), axis=1)])
+    counts = np.hstack([zeros, np.cumsum(present, axis=1)])
+
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        sums = totals[:, window:] - totals[:, :-window]
+        complete = counts[:, window:] - counts[:, :-window] == window
+        out[:, window - 1:] = np.where(complete, sums, np.nan)
+    return out
+
+
+def resolve_ttm_periods(keys) -> dict:
+    """
+    {(year, quarter): TimePeriod} of the "ttm" periods ending at each key.
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+    TimePeriod.objects.bulk_create(
+        [TimePeriod(year=year, quarter=quarter, period_type="ttm") for year, quarter in keys],
+        ignore_conflicts=True,
+    )
+    return {
+        (p.year, p.quarter): p
+        for p in TimePeriod.objects.filter(period_type="ttm", year__in={year for year, _ in keys})
+    }
+
+
+def compute_ttm(company_ids=None):
+    """
+    Stores trailing-twelve-month sums of the quarterly flow metrics as
+    FinancialValue rows on "ttm" periods, one per quarter that closes four
+    consecutive reported quarters. All companies, metrics and quarters are
+    handled in one query and one vectorized pass. TTM values that no longer
+    have four quarters behind them are set to NULL.
+    Returns the number of values written.
+    """
+    values = FinancialValue.objects.filter(
+        metric__category__code__in=FLOW_CATEGORIES,
+        time_period__period_type="quarterly",
+        value__isnull=False,
+    )
+    existing = FinancialValue.objects.filter(time_period__period_type="ttm")
+    if company_ids is not None:
+        values = values.filter(company_id__in=company_ids)
+        existing = existing.filter(company_id__in=company_ids)
+
+    rows = list(values.values_list("company_id", "metric_id", "time_period__year", "time_period__quarter", "value"))
+    written = {}
+    if rows:
+        df = pd.DataFrame(rows, columns=["company_id", "metric_id", "year", "quarter", "value"])
+        df["sequence"] = _sequence(df["year"], df["quarter"])
+        df["value"] = df["value"].astype(float)
+        frame = df.pivot_table(index=["company_id", "metric_id"], columns="sequence", values="value", aggfunc="last")
+        # Gaps become NaN columns, so a window never spans a missing quarter
+        sequences = range(frame.columns.min(), frame.columns.max() + 1)
+        frame = frame.reindex(columns=sequences)
+
+        ttm = rolling_sums(frame.to_numpy())
+        row_idx, col_idx = np.nonzero(~np.isnan(ttm))
+        periods = resolve_ttm_periods({_from_sequence(sequences[c]) for c in set(col_idx.tolist())})
+        for r, c in zip(row_idx, col_idx):
+            company_id, metric_id = frame.index[r]
+            period = periods[_from_sequence(sequences[c])]
+            written[(int(company_id), int(metric_id), period.pk)] = round(float(ttm[r, c]), 4)
+
+    for key in existing.values_list("company_id", "metric_id", "time_period_id"):
+        written.setdefault(key, None)
+
+    FinancialValue.objects.bulk_create(
+        [
+            FinancialValue(company_id=company_id, metric_id=metric_id, time_period_id=period_id, value=value)
+            for (company_id, metric_id, period_id), value in written.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["company", "metric", "time_period"],
+        update_fields=["value"],
+        batch_size=BATCH_SIZE,
+    )
+    # bulk writes skip post_save, so invalidate cached pages explicitly
+    for company_id in {company_id for company_id, _, _ in written}:
+        bump_company_version(company_id)
+    return len(written)
+
+
+def latest_ttm_values(company_ids, metric_codes, anchor="SALES"):
+    """
+    {(company_id, metric_code): value} of each company's most recent TTM
+    period, taken as the latest one with a value for ``anchor``. Every
+    metric is read from that same period, so ratios never mix windows, and
+    a metric missing there is left out rather than taken from an older one.
+    One query with a correlated subquery.
+    """
+    latest_period = (
+        FinancialValue.objects
+        .filter(
+            company_id=OuterRef("company_id"),
+            metric__code=anchor,
+            time_period__period_type="ttm",
+            value__isnull=False,
+        )
+        .order_by("-time_period__year", "-time_period__quarter")
+        .values("time_period_id")[:1]
+    )
+    rows = (
+        FinancialValue.objects
+        .filter(
+            company_id__in=company_ids,
+            metric__code__in=metric_codes,
+            time_period_id=Subquery(latest_period),
+            value__isnull=False,
+        )
+        .values_list("company_id", "metric__code", "value")
+    )
+    return {(company_id, code): value for company_id, code, value in rows}
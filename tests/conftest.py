@@ -1,6 +1,27 @@
 import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from stock_tracker.celery import app as celery_app
+from stocks.utils.market_data import ReplayProvider
 from stocks.models import Company, Metric, MetricCategory, TimePeriod, FinancialValue, CompanyFundamental, CompanyMarketSnapshot
 
+def pytest_configure(config):
+    # Production shares a Redis cache between processes; tests need no server
+    override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }).enable()
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+@pytest.fixture(autouse=True)
+def celery_eager(monkeypatch):
+    # Tasks queued by the code under test run inline instead of needing a broker
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+
 @pytest.fixture
 def company(db):
     return Company.objects.create(
@@ -74,3 +95,9 @@ def company_market_snapshot(db, company):
         market_cap=10000.00,
         pe=20.00
     )
+
+@pytest.fixture
+def replay_provider(settings, tmp_path):
+    settings.MARKET_DATA_PROVIDER = "replay"
+    settings.MARKET_DATA_REPLAY_DIR = tmp_path
+    return ReplayProvider(tmp_path)
@@ -0,0 +1,102 @@
+from unittest import mock
+
+import pandas as pd
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from stocks import admin as stocks_admin
+from stocks.models import BackgroundJob, Company, FinancialValue, Index, IndexCategory
+from stocks.utils import background_jobs
+from stocks.utils.background_jobs import run_job, save_upload
+
+from tests.test_import_excel import write_workbook
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path / "media"
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture
+def index(db):
+    category = IndexCategory.objects.create(code="BROAD", name="Broad")
+    return Index.objects.create(name="Nifty 50", ticker="^NSEI", exchange="nse", category=category)
+
+
+@pytest.mark.django_db
+class TestRunJob:
+
+    def test_company_onboarding(self, company, replay_provider, media, tmp_path):
+        idx = pd.DatetimeIndex(["2024-01-01", "2024-01-02"])
+        replay_provider.record("TEST.NS", history=pd.DataFrame({"Close": [10.0, 11.0], "Volume": [1, 2]}, index=idx))
+        with open(write_workbook(tmp_path / "t.xlsx"), "rb") as f:
+            upload = save_upload(ContentFile(f.read()), company.ticker)
+        job = BackgroundJob.objects.create(kind="company_onboarding", company=company, upload=upload)
+
+        assert run_job(job.pk) == "succeeded"
+
+        job.refresh_from_db()
+        assert (job.status, job.progress, job.step) == ("succeeded", 100, "")
+        assert job.started_at and job.finished_at
+        assert company.price_history.count() == 2
+        assert company.market.price == 11
+        assert FinancialValue.objects.filter(company=company).count() == 9
+        assert not default_storage.exists(upload)
+
+    def test_failing_step_fails_job(self, index, monkeypatch):
+        monkeypatch.setattr(background_jobs, "get_index_history", mock.Mock(side_effect=RuntimeError("rate limited")))
+        job = BackgroundJob.objects.create(kind="index_history", index=index)
+
+        assert run_job(job.pk) == "failed"
+
+        job.refresh_from_db()
+        assert (job.status, job.step, job.progress) == ("failed", "Index history", 0)
+        assert "rate limited" in job.error
+
+
+@pytest.mark.django_db
+class TestAdmin:
+
+    def test_company_save_queues_job(self, admin_client, media, tmp_path, monkeypatch, django_capture_on_commit_callbacks):
+        delay = mock.Mock()
+        monkeypatch.setattr(stocks_admin.run_background_job, "delay", delay)
+        with open(write_workbook(tmp_path / "t.xlsx"), "rb") as f:
+            excel = SimpleUploadedFile("t.xlsx", f.read())
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = admin_client.post(reverse("admin:stocks_company_add"), {
+                "name": "New Co", "ticker": "NEWCO", "exchange": "nse", "sector": "Tech",
+                "is_active": "on", "excel_file": excel,
+            })
+
+        assert response.status_code == 302
+        job = BackgroundJob.objects.get()
+        assert (job.kind, job.company, job.status) == ("company_onboarding", Company.objects.get(ticker="NEWCO"), "pending")
+        assert default_storage.exists(job.upload)
+        delay.assert_called_once_with(job.pk)
+
+    def test_index_save_queues_job(self, admin_client, index, monkeypatch, django_capture_on_commit_callbacks):
+        delay = mock.Mock()
+        monkeypatch.setattr(stocks_admin.run_background_job, "delay", delay)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_client.post(reverse("admin:stocks_index_change", args=[index.pk]), {
+                "name": "Nifty 50", "ticker": "^NSEI", "exchange": "nse", "category": index.category_id,
+                "calculation_method": "ff", "metadata": "{}",
+            })
+
+        delay.assert_called_once_with(BackgroundJob.objects.get(kind="index_history", index=index).pk)
+
+    def test_progress_page_refreshes_while_running(self, admin_client, company):
+        job = BackgroundJob.objects.create(kind="company_onboarding", company=company, status="running", progress=50)
+        url = reverse("admin:stocks_backgroundjob_change", args=[job.pk])
+
+        response = admin_client.get(url)
+        assert 'http-equiv="refresh"' in response.content.decode()
+        assert 'value="50"' in response.content.decode()
+
+        BackgroundJob.objects.filter(pk=job.pk).update(status="succeeded")
+        assert 'http-equiv="refresh"' not in admin_client.get(url).content.decode()
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from django.urls import reverse
+from stocks.models import CompanyHistory
+from stocks.utils.chart_series import build_chart_series, lttb_indices
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    y = np.sin(np.linspace(0, 20, 5000))
+    y[1234] = 50
+
+    keep = lttb_indices(y, 100)
+
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 4999
+    assert 1234 in keep
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_returns_everything_when_under_threshold():
+    assert list(lttb_indices([1, 2, 3], 10)) == [0, 1, 2]
+
+
+@pytest.mark.django_db
+class TestChartSeries:
+
+    @pytest.fixture
+    def history(self, company):
+        start = date(2000, 1, 1)
+        CompanyHistory.objects.bulk_create([
+            CompanyHistory(company=company, date=start + timedelta(days=i), closing_price=100 + i % 7, volume=10)
+            for i in range(4000)
+        ])
+
+    def test_downsamples_range(self, company, history):
+        series = build_chart_series(company, "MAX", points=200)
+
+        assert series["range"] == "MAX"
+        assert series["ranges"] == ["1M", "6M", "1Y", "3Y", "5Y", "10Y", "MAX"]
+        assert len(series["dates"]) == len(series["prices"]) == len(series["volumes"]) == 200
+        assert sum(series["volumes"]) == 4000 * 10
+
+    def test_invalid_range_falls_back_to_default(self, company, history):
+        series = build_chart_series(company, "bogus", points=50)
+
+        assert series["range"] == "10Y"
+        assert series["dates"][-1] == "2010-12-13"
+
+    def test_endpoint(self, client, company, history):
+        response = client.get(reverse("stock-chart", args=[company.ticker]), {"range": "1M", "points": "5000"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["range"] == "1M"
+        assert data["dates"][0] == "2010-11-13"
+        assert len(data["dates"]) == 31
+
+    def test_endpoint_without_history(self, client, company):
+        response = client.get(reverse("stock-chart", args=[company.ticker]))
+
+        assert response.json() == {"has_data": False}
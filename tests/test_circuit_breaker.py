@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+from stocks.models import FailedFetch
+from stocks.tasks import retry_failed_fetches, update_company_snapshot, update_company_snapshots
+from stocks.utils import market_data
+from stocks.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError("throttled")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test:breaker", min_calls=4, error_rate=0.5, cooldown=30, max_cooldown=100, clock=clock)
+
+
+def test_opens_at_error_rate_and_short_circuits(breaker):
+    calls = []
+    breaker.call(calls.append, 1)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.retry_after() == 0
+
+    # Fourth call: 3 of 4 failed
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.retry_after() == 30
+
+    with pytest.raises(CircuitOpenError) as e:
+        breaker.call(calls.append, 2)
+    assert e.value.retry_after == 30
+    assert calls == [1]
+
+
+def test_single_probe_after_cooldown(breaker, clock):
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+    clock.now += 30
+    assert breaker.allow()
+    # Everyone else waits for the probe's outcome
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.retry_after() == 0
+
+
+def test_failed_probe_doubles_cooldown(breaker, clock):
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+    for cooldown in (60, 100):
+        clock.now += breaker.retry_after()
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+        assert breaker.retry_after() == cooldown
+
+
+def test_backoff_grows_with_error_rate_and_covers_open_breaker(breaker, clock):
+    assert 30 <= breaker.backoff(0) <= 60
+    assert 60 <= breaker.backoff(1) <= 120
+
+    breaker.record_success()
+    breaker.record_failure()
+    # Half the calls failing triples the base
+    assert 90 <= breaker.backoff(0) <= 180
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.retry_after() == 30
+    clock.now += 1
+    assert breaker.backoff(0) >= 29
+
+
+@pytest.mark.django_db
+class TestSnapshotTasks:
+
+    @pytest.fixture
+    def throttled(self, replay_provider, monkeypatch):
+        calls = []
+
+        def latest_quotes(self, symbols):
+            calls.append(list(symbols))
+            raise ConnectionError("429 Too Many Requests")
+
+        monkeypatch.setattr(market_data.ReplayProvider, "latest_quotes", latest_quotes)
+        return calls
+
+    def test_retries_then_records_failure(self, throttled, company):
+        update_company_snapshot.delay(company.id)
+
+        assert len(throttled) == 1 + update_company_snapshot.max_retries
+        fetch = FailedFetch.objects.get(kind="company_snapshot", symbol="TEST.NS")
+        assert fetch.company == company
+        assert fetch.attempts == len(throttled)
+        assert "429" in fetch.error
+
+    def test_open_breaker_short_circuits(self, throttled, company, other_company, settings):
+        settings.MARKET_DATA_BREAKER = {**settings.MARKET_DATA_BREAKER, "min_calls": 1}
+        market_data.get_breaker().record_failure()
+
+        result = update_company_snapshots.delay([company.id, other_company.id])
+
+        assert result.successful()
+        assert throttled == []
+        assert set(FailedFetch.objects.values_list("symbol", flat=True)) == {"TEST.NS", "OTHER.NS"}
+        assert retry_failed_fetches() == {"companies": 0, "indices": 0, "weekly": 0}
+
+    def test_retry_pass_refetches_failed_only(self, replay_provider, company, other_company):
+        replay_provider.record(
+            "TEST.NS",
+            history=pd.DataFrame({"Close": [100.0], "Volume": [10]}, index=pd.DatetimeIndex(["2024-03-01"])),
+        )
+        FailedFetch.objects.create(kind="company_snapshot", symbol="TEST.NS", company=company)
+        FailedFetch.objects.create(kind="company_snapshot", symbol="OTHER.NS", company=other_company)
+
+        assert retry_failed_fetches() == {"companies": 2, "indices": 0, "weekly": 0}
+
+        # TEST recovered, OTHER still has no data
+        fetch = FailedFetch.objects.get()
+        assert (fetch.symbol, fetch.attempts, fetch.error) == ("OTHER.NS", 2, "no data returned")
+        assert float(company.market.price) == 100.0
@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+
+import pytest
+from django.urls import reverse
+from stocks.models import CompanyHistory, FinancialValue, Metric, TimePeriod
+from stocks.utils.company_cache import bump_company_version, cached_for_company, get_company_version
+
+
+@pytest.mark.django_db
+class TestCompanyCache:
+
+    def test_bump_changes_version(self, company, django_capture_on_commit_callbacks):
+        version = get_company_version(company.pk)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            bump_company_version(company.pk)
+
+        assert get_company_version(company.pk) == version + 1
+
+    def test_cached_value_is_reused_until_bumped(self, company, django_capture_on_commit_callbacks):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return len(calls)
+
+        assert cached_for_company(company.pk, "thing", build) == 1
+        assert cached_for_company(company.pk, "thing", build) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            bump_company_version(company.pk)
+
+        assert cached_for_company(company.pk, "thing", build) == 2
+
+    def test_section_invalidated_by_financial_value_write(
+        self, client, company, metric, metric_category, time_period_annual, financial_value,
+        django_capture_on_commit_callbacks, django_assert_num_queries,
+    ):
+        url = reverse("stock-section", args=[company.ticker, "pnl"])
+        assert "Sales" in client.get(url).content.decode()
+
+        # Served from cache: only the company lookup hits the database
+        with django_assert_num_queries(1):
+            client.get(url)
+
+        expenses = Metric.objects.create(code="EXPENSES", name="Expenses", category=metric_category)
+        with django_capture_on_commit_callbacks(execute=True):
+            FinancialValue.objects.create(company=company, metric=expenses, time_period=time_period_annual, value=5)
+
+        assert "Expenses" in client.get(url).content.decode()
+
+    def test_company_delete_bumps_once(self, company, metric, django_capture_on_commit_callbacks):
+        start = date(2024, 1, 1)
+        CompanyHistory.objects.bulk_create([
+            CompanyHistory(company=company, date=start + timedelta(days=i), closing_price=1, volume=1) for i in range(50)
+        ])
+        FinancialValue.objects.bulk_create([
+            FinancialValue(company=company, metric=metric, time_period=TimePeriod.objects.create(year=year, period_type="annual"), value=1)
+            for year in range(2000, 2020)
+        ])
+        company_id = company.pk
+        version = get_company_version(company_id)
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            company.delete()
+
+        # One version bump and one search index refresh, not one per row
+        assert len(callbacks) == 2
+        assert get_company_version(company_id) == version + 1
+
+    def test_metric_delete_bumps_each_company(self, company, other_company, metric, financial_value, django_capture_on_commit_callbacks):
+        FinancialValue.objects.create(company=other_company, metric=metric, time_period=financial_value.time_period, value=1)
+        versions = {c.pk: get_company_version(c.pk) for c in (company, other_company)}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            metric.delete()
+
+        assert all(get_company_version(pk) > version for pk, version in versions.items())
@@ -0,0 +1,117 @@
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.urls import reverse
+from stocks.models import DirtyCompany, FinancialValue, Metric, MetricCategory, TimePeriod
+from stocks.utils.formulas import FormulaError, derived_metrics, evaluate_derived_metrics, parse_formula
+from stocks.utils.gen_fundamentals import recompute_dirty_fundamentals
+
+
+def test_parse_formula_collects_codes():
+    _, names = parse_formula("NET_PROFIT / (SALES - 1.5) * 100")
+
+    assert names == {"NET_PROFIT", "SALES"}
+
+
+@pytest.mark.parametrize("formula", ["__import__('os')", "SALES.real", "SALES if 1 else 2", "'a' * 2", "SALES /"])
+def test_parse_formula_rejects_non_arithmetic(formula):
+    with pytest.raises(FormulaError):
+        parse_formula(formula)
+
+
+def test_parse_formula_rejects_numbers_beyond_float():
+    with pytest.raises(FormulaError):
+        parse_formula("SALES * 1" + "0" * 400)
+
+
+@pytest.mark.django_db
+class TestDerivedMetrics:
+
+    @pytest.fixture
+    def ratio(self, db):
+        category = MetricCategory.objects.get_or_create(code="RATIO")[0]
+
+        def create(code, formula):
+            return Metric.objects.create(code=code, name=code.title(), category=category, formula=formula)
+
+        return create
+
+    @pytest.fixture
+    def values(self, company, metric_category):
+        sales = Metric.objects.create(code="SALES", name="Sales", category=metric_category)
+        profit = Metric.objects.create(code="NET_PROFIT", name="Net profit", category=metric_category)
+        periods = [TimePeriod.objects.create(year=year, period_type="annual") for year in (2022, 2023)]
+        FinancialValue.objects.bulk_create([
+            FinancialValue(company=company, metric=sales, time_period=periods[0], value=200),
+            FinancialValue(company=company, metric=profit, time_period=periods[0], value=20),
+            FinancialValue(company=company, metric=sales, time_period=periods[1], value=0),
+            FinancialValue(company=company, metric=profit, time_period=periods[1], value=5),
+        ])
+        return periods
+
+    def derived(self, company, code):
+        return dict(
+            FinancialValue.objects
+            .filter(company=company, metric__code=code)
+            .values_list("time_period__year", "value")
+        )
+
+    def test_orders_by_dependency_and_skips_cycles(self, ratio):
+        ratio("B", "A * 2")
+        ratio("A", "SALES + 1")
+        ratio("X", "Y + 1")
+        ratio("Y", "X + 1")
+
+        order = [metric.code for metric, _, _ in derived_metrics()]
+        assert order.index("A") < order.index("B")
+        assert "X" not in order and "Y" not in order
+
+    def test_evaluates_chained_formulas(self, company, values, ratio):
+        ratio("DOUBLE_NPM", "NPM * 2")
+        ratio("NPM", "NET_PROFIT / SALES * 100")
+
+        evaluate_derived_metrics()
+
+        assert self.derived(company, "NPM") == {2022: 10}
+        assert self.derived(company, "DOUBLE_NPM") == {2022: 20}
+
+    def test_huge_power_overflows_instead_of_hanging(self, company, values, ratio):
+        ratio("HUGE", "SALES * 9 ** 9 ** 9")
+        ratio("SQUARE", "SALES ** 2")
+
+        evaluate_derived_metrics()
+
+        assert self.derived(company, "HUGE") == {}
+        assert self.derived(company, "SQUARE") == {2022: 40000, 2023: 0}
+
+    def test_clears_values_whose_inputs_are_gone(self, company, values, ratio):
+        ratio("NPM", "NET_PROFIT / SALES * 100")
+        evaluate_derived_metrics([company.pk])
+        FinancialValue.objects.filter(company=company, metric__code="SALES").update(value=None)
+
+        evaluate_derived_metrics([company.pk])
+
+        assert self.derived(company, "NPM") == {2022: None}
+
+    def test_formula_change_recomputes_every_company(self, company, values, ratio, client):
+        ratio("NPM", "NET_PROFIT / SALES * 100")
+
+        assert DirtyCompany.objects.filter(company=company).exists()
+        recompute_dirty_fundamentals()
+
+        response = client.get(reverse("stock-section", args=[company.ticker, "ratios"]))
+        assert "Npm" in response.content.decode()
+
+    def test_command_backfills_derived_metrics(self, company, values, ratio):
+        ratio("NPM", "NET_PROFIT / SALES * 100")
+        DirtyCompany.objects.all().delete()
+
+        call_command("generate_fundamentals")
+
+        assert self.derived(company, "NPM") == {2022: 10}
+
+    def test_clean_rejects_bad_formula(self, ratio):
+        metric = Metric(code="BAD", name="Bad", category=MetricCategory.objects.get(code="PNL"), formula="BAD + 1")
+
+        with pytest.raises(ValidationError):
+            metric.clean()
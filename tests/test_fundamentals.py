@@ -0,0 +1,211 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from stocks import tasks
+from stocks.models import (
+    Company,
+    CompanyFundamental,
+    DirtyCompany,
+    FinancialValue,
+    Metric,
+    MetricCategory,
+    TimePeriod,
+)
+from stocks.utils.gen_fundamentals import compute_fundamentals, recompute_dirty_fundamentals
+from stocks.utils.ttm import compute_ttm
+
+LAST_YEAR = date.today().year - 1
+
+
+@pytest.fixture
+def add_value(db):
+    categories = {c.code: c for c in MetricCategory.objects.all()}
+
+    def add(company, code, value, year, quarter=None):
+        category = "PNL" if code in ("SALES", "OPERATING_PROFIT", "NET_PROFIT") else "BS"
+        metric, _ = Metric.objects.get_or_create(code=code, defaults={"name": code.title(), "category": categories[category]})
+        period, _ = TimePeriod.objects.get_or_create(
+            year=year, quarter=quarter, period_type="quarterly" if quarter else "annual",
+        )
+        FinancialValue.objects.create(company=company, metric=metric, time_period=period, value=value)
+
+    return add
+
+
+@pytest.mark.django_db
+class TestComputeFundamentals:
+
+    def test_ratios_from_quarters_and_latest_balance_sheet(self, company, other_company, add_value):
+        for quarter in range(1, 5):
+            add_value(company, "SALES", 250, LAST_YEAR, quarter)
+            add_value(company, "OPERATING_PROFIT", 50, LAST_YEAR, quarter)
+            add_value(company, "NET_PROFIT", 25, LAST_YEAR, quarter)
+        add_value(company, "EQUITY_SHARE_CAPITAL", 100, LAST_YEAR - 1)
+        add_value(company, "EQUITY_SHARE_CAPITAL", 200, LAST_YEAR)
+        add_value(company, "RESERVES", 300, LAST_YEAR)
+        add_value(company, "BORROWINGS", 250, LAST_YEAR)
+        # Only three quarters: no revenue
+        for quarter in range(1, 4):
+            add_value(other_company, "SALES", 10, LAST_YEAR, quarter)
+
+        compute_ttm()
+        assert compute_fundamentals() == 2
+
+        f = CompanyFundamental.objects.get(company=company)
+        assert f.revenue == Decimal("1000")
+        assert f.operating_margin == Decimal("20")
+        assert f.net_margin == Decimal("10")
+        assert f.roe == Decimal("20")
+        assert f.roce == Decimal("26.67")
+        assert f.debt_to_equity == Decimal("0.5")
+
+        other = CompanyFundamental.objects.get(company=other_company)
+        assert [getattr(other, name) for name in ("revenue", "operating_margin", "roe", "debt_to_equity")] == [None] * 4
+
+    def test_ttm_metrics_read_from_the_same_period(self, company, add_value):
+        for year, quarter in [(LAST_YEAR - 1, 4), (LAST_YEAR, 1), (LAST_YEAR, 2), (LAST_YEAR, 3), (LAST_YEAR, 4)]:
+            add_value(company, "SALES", 250, year, quarter)
+            add_value(company, "OPERATING_PROFIT", 50, year, quarter)
+            # The latest quarter's net profit is not reported yet
+            if (year, quarter) != (LAST_YEAR, 4):
+                add_value(company, "NET_PROFIT", 25, year, quarter)
+
+        compute_ttm()
+        compute_fundamentals()
+
+        f = CompanyFundamental.objects.get(company=company)
+        assert (f.revenue, f.operating_margin) == (Decimal("1000"), Decimal("20"))
+        # Not the older window's net profit over the newer window's sales
+        assert f.net_margin is None
+
+    def test_ratio_too_large_to_store_is_left_empty(self, company, other_company, add_value):
+        for quarter in range(1, 5):
+            add_value(company, "SALES", Decimal("0.01"), LAST_YEAR, quarter)
+            add_value(company, "NET_PROFIT", 100, LAST_YEAR, quarter)
+        add_value(company, "RESERVES", Decimal("0.01"), LAST_YEAR)
+        add_value(other_company, "BORROWINGS", 10, LAST_YEAR)
+        add_value(other_company, "RESERVES", 40, LAST_YEAR)
+
+        compute_ttm()
+        assert compute_fundamentals() == 2
+
+        f = CompanyFundamental.objects.get(company=company)
+        assert (f.revenue, f.net_margin, f.roe) == (Decimal("0.04"), None, None)
+        assert CompanyFundamental.objects.get(company=other_company).debt_to_equity == Decimal("0.25")
+
+    def test_updates_existing_rows_in_constant_queries(self, company_fundamental, add_value, django_assert_num_queries):
+        companies = [
+            Company.objects.create(name=f"Co {i}", ticker=f"CO{i}", exchange="nse", sector="Tech")
+            for i in range(20)
+        ]
+        for c in companies:
+            add_value(c, "BORROWINGS", 10, LAST_YEAR)
+            add_value(c, "RESERVES", 40, LAST_YEAR)
+
+        with django_assert_num_queries(5):
+            compute_fundamentals()
+
+        assert CompanyFundamental.objects.count() == 21
+        assert CompanyFundamental.objects.get(company=companies[0]).debt_to_equity == Decimal("0.25")
+        company_fundamental.refresh_from_db()
+        assert company_fundamental.revenue is None
+
+    def test_selected_companies_only(self, company, other_company):
+        compute_fundamentals([other_company.pk])
+
+        assert list(CompanyFundamental.objects.values_list("company", flat=True)) == [other_company.pk]
+
+    def test_cagr(self, company, other_company, add_value):
+        # Sales double every 5 years; 2 years back from the latest is missing
+        for offset, sales in [(10, 100), (5, 200), (3, 250), (0, 400)]:
+            add_value(company, "SALES", sales, LAST_YEAR - offset)
+        add_value(company, "NET_PROFIT", -10, LAST_YEAR - 5)
+        add_value(company, "NET_PROFIT", 20, LAST_YEAR)
+        # Latest year reported is older for this company
+        add_value(other_company, "SALES", 100, LAST_YEAR - 4)
+        add_value(other_company, "SALES", 133.1, LAST_YEAR - 1)
+
+        compute_fundamentals()
+
+        f = CompanyFundamental.objects.get(company=company)
+        assert f.sales_cagr_10y == Decimal("14.87")
+        assert f.sales_cagr_5y == Decimal("14.87")
+        assert f.sales_cagr_3y == Decimal("16.96")
+        assert f.profit_cagr_5y is None
+        assert f.profit_cagr_3y is None
+        other = CompanyFundamental.objects.get(company=other_company)
+        assert other.sales_cagr_3y == Decimal("10.00")
+        assert other.sales_cagr_5y is None
+
+
+@pytest.mark.django_db
+class TestDirtyFundamentals:
+
+    def test_edits_coalesce_into_one_recompute(self, company, add_value, monkeypatch, django_capture_on_commit_callbacks):
+        apply_async = mock.Mock()
+        monkeypatch.setattr(tasks.recompute_fundamentals, "apply_async", apply_async)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            add_value(company, "BORROWINGS", 10, LAST_YEAR)
+        with django_capture_on_commit_callbacks(execute=True):
+            add_value(company, "RESERVES", 40, LAST_YEAR)
+
+        apply_async.assert_called_once()
+        assert list(DirtyCompany.objects.values_list("company", flat=True)) == [company.pk]
+
+        assert tasks.recompute_fundamentals() == 1
+        assert CompanyFundamental.objects.get(company=company).debt_to_equity == Decimal("0.25")
+        assert not DirtyCompany.objects.exists()
+        assert recompute_dirty_fundamentals() == 0
+
+    def test_marks_newer_than_the_run_survive(self, company, other_company):
+        DirtyCompany.objects.create(company=company, marked_at=timezone.now())
+        DirtyCompany.objects.create(company=other_company, marked_at=timezone.now() + timedelta(minutes=1))
+
+        assert recompute_dirty_fundamentals() == 2
+        assert list(DirtyCompany.objects.values_list("company", flat=True)) == [other_company.pk]
+
+    def test_limited_to_given_companies(self, company, other_company):
+        DirtyCompany.objects.create(company=company, marked_at=timezone.now())
+        DirtyCompany.objects.create(company=other_company, marked_at=timezone.now())
+
+        assert recompute_dirty_fundamentals([company.pk]) == 1
+        assert list(CompanyFundamental.objects.values_list("company", flat=True)) == [company.pk]
+
+    def test_deleting_company_leaves_no_mark(self, company, other_company, add_value):
+        add_value(company, "SALES", 100, LAST_YEAR)
+        add_value(other_company, "SALES", 100, LAST_YEAR)
+        DirtyCompany.objects.all().delete()
+
+        company.delete()
+        Company.objects.filter(pk=other_company.pk).delete()
+
+        assert not DirtyCompany.objects.exists()
+        # Deferred foreign keys are checked here rather than at commit
+        connection.check_constraints()
+
+    def test_metric_delete_marks_each_company_once(self, company, other_company, add_value, django_capture_on_commit_callbacks):
+        for quarter in range(1, 5):
+            add_value(company, "SALES", 100, LAST_YEAR, quarter)
+            add_value(other_company, "SALES", 100, LAST_YEAR, quarter)
+        DirtyCompany.objects.all().delete()
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            Metric.objects.get(code="SALES").delete()
+
+        assert set(DirtyCompany.objects.values_list("company", flat=True)) == {company.pk, other_company.pk}
+        # A version bump per company and a single recompute
+        assert len(callbacks) == 3
+
+
+
+@pytest.mark.django_db
+def test_command(company):
+    call_command("generate_fundamentals")
+
+    assert CompanyFundamental.objects.filter(company=company).exists()
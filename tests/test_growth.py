@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from stocks.models import FinancialGrowth, FinancialValue, TimePeriod
+from stocks.utils.growth import compute_growth, growth
+from stocks.utils.statements import get_statement
+
+
+def test_growth_against_absolute_base():
+    values = np.array([[100, 150, np.nan, 60], [-50, -25, 0, 10]], dtype=float)
+
+    out = growth(values, 1)
+
+    np.testing.assert_allclose(out[0, :2], [np.nan, 50])
+    assert np.isnan(out[0, 2:]).all()
+    np.testing.assert_allclose(out[1, 1:3], [50, 100])
+    assert np.isnan(out[1, 3])
+
+
+@pytest.mark.django_db
+class TestComputeGrowth:
+
+    @pytest.fixture
+    def quarters(self, company, metric):
+        # FY2022 Q1 .. FY2023 Q2
+        for i, (year, quarter) in enumerate([(2022, 1), (2022, 2), (2022, 3), (2022, 4), (2023, 1), (2023, 2)]):
+            period = TimePeriod.objects.create(year=year, quarter=quarter, period_type="quarterly")
+            FinancialValue.objects.create(company=company, metric=metric, time_period=period, value=100 + 10 * i)
+
+    def test_quarterly_yoy_and_qoq(self, company, quarters):
+        compute_growth()
+
+        latest = FinancialGrowth.objects.get(financial_value__time_period__year=2023, financial_value__time_period__quarter=2)
+        assert latest.yoy == Decimal("36.36")
+        assert latest.qoq == Decimal("7.14")
+        first = FinancialValue.objects.get(time_period__year=2022, time_period__quarter=1)
+        assert not FinancialGrowth.objects.filter(financial_value=first).exists()
+
+    def test_command_backfills_growth(self, company, quarters):
+        call_command("generate_fundamentals")
+
+        assert FinancialGrowth.objects.filter(financial_value__company=company).count() == 5
+
+    def test_annual_yoy_in_statement_without_extra_queries(self, client, company, metric, django_assert_num_queries):
+        for year, value in [(2021, 80), (2022, 100)]:
+            period = TimePeriod.objects.create(year=year, period_type="annual")
+            FinancialValue.objects.create(company=company, metric=metric, time_period=period, value=value)
+        compute_growth([company.pk])
+
+        with django_assert_num_queries(2):
+            _, rows = get_statement(company, "pnl")
+
+        assert rows[0]["growth"] == [(None, None), (Decimal("25.00"), None)]
+        response = client.get(reverse("stock-section", args=[company.ticker, "pnl"]))
+        assert 'title="YoY 25.0%"' in response.content.decode()
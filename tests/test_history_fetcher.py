@@ -0,0 +1,84 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+from django.core.management import call_command
+from stocks.models import CompanyHistory, Index, IndexCategory
+from stocks.utils import market_data
+from stocks.utils.history_fetcher import fetch_histories, history_jobs
+from stocks.utils.rate_limit import RateLimiter
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+def test_rate_limiter_spreads_requests_over_seconds():
+    clock = FakeClock(1000.25)
+    limiter = RateLimiter("test:limiter", 2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(5):
+        limiter.acquire()
+
+    assert clock.sleeps == [0.75, 1.0]
+
+
+@pytest.fixture
+def recorded(replay_provider, company, other_company, monkeypatch):
+    idx = pd.DatetimeIndex(["2024-01-01", "2024-01-02", "2024-01-03"])
+    frame = pd.DataFrame({"Close": [10.0, 11.0, 12.0], "Volume": [1, 2, 3]}, index=idx)
+    replay_provider.record("TEST.NS", history=frame)
+    replay_provider.record("^NSEI", history=frame)
+    category = IndexCategory.objects.create(code="BROAD", name="Broad")
+    index = Index.objects.create(
+        name="Nifty 50", ticker="NIFTY50", exchange="nse", category=category,
+        metadata={"yahoo_symbol": "^NSEI"},
+    )
+
+    history = market_data.ReplayProvider.history
+
+    def flaky(self, symbol, start=None):
+        if symbol == "OTHER.NS":
+            raise ConnectionError("reset by peer")
+        return history(self, symbol, start)
+
+    monkeypatch.setattr(market_data.ReplayProvider, "history", flaky)
+    return index
+
+
+@pytest.mark.django_db
+class TestFetchHistories:
+
+    def test_fetches_and_writes_everything(self, company, recorded):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=1, volume=1)
+        jobs = history_jobs()
+
+        assert {(job.symbol, job.start) for job in jobs} == {
+            ("TEST.NS", date(2024, 1, 2)), ("OTHER.NS", None), ("^NSEI", None),
+        }
+
+        summary = fetch_histories(jobs, workers=3, rate=0, queue_size=1)
+
+        assert summary["targets"] == 3
+        assert summary["written"] == 2
+        assert summary["rows"] == 2 + 3
+        assert summary["failed"] == {"OTHER.NS": "ConnectionError: reset by peer"}
+        assert company.price_history.get(date=date(2024, 1, 2)).closing_price == 11
+        assert recorded.history.count() == 3
+
+    def test_command_summary(self, recorded, capsys):
+        call_command("get_all_histories", full=True, workers=2, rate=0)
+
+        out, err = capsys.readouterr()
+        assert "2/3 histories, 6 rows" in out
+        assert "Failed for OTHER.NS" in err
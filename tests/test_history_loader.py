@@ -0,0 +1,66 @@
+from datetime import date
+from decimal import Decimal
+
+import io
+
+import pandas as pd
+import pytest
+from stocks.models import CompanyHistory
+from stocks.utils import history_loader
+from stocks.utils.history_loader import upsert_frame
+
+FIELDS = ["company", "date", "closing_price", "volume"]
+
+
+def frame(company, days, price):
+    return pd.DataFrame({
+        "company_id": company.pk,
+        "date": pd.date_range("2024-01-01", periods=days),
+        "closing_price": [price + i for i in range(days)],
+        "volume": range(days),
+    })
+
+
+def test_psycopg2_copy_reads_whole_buffer(monkeypatch):
+    copied = []
+
+    class Cursor:
+        def copy_expert(self, sql, file):
+            copied.append(file.read())
+
+    monkeypatch.setattr(history_loader, "is_psycopg3", False)
+    buffer = io.StringIO()
+    buffer.write("1,2024-01-01\n")
+    history_loader._copy(Cursor(), "COPY t FROM STDIN", buffer)
+
+    assert copied == ["1,2024-01-01\n"]
+
+
+@pytest.mark.django_db
+class TestUpsertFrame:
+
+    def stored(self, company):
+        return dict(company.price_history.values_list("date", "closing_price"))
+
+    def test_copy_merges_in_batches(self, company, monkeypatch):
+        monkeypatch.setattr(history_loader, "COPY_BATCH_SIZE", 4)
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=1, volume=1)
+        data = pd.concat([frame(company, 10, 100.123), frame(company, 1, 500)])
+
+        assert upsert_frame(CompanyHistory, FIELDS, ["company", "date"], data) == 10
+
+        stored = self.stored(company)
+        assert len(stored) == 10
+        assert stored[date(2024, 1, 1)] == 500
+        assert stored[date(2024, 1, 2)] == Decimal("101.12")
+        assert company.price_history.get(date=date(2024, 1, 10)).volume == 9
+
+    def test_bulk_create_fallback(self, company):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 1), closing_price=1, volume=1)
+
+        history_loader._bulk_upsert(CompanyHistory, FIELDS, ["company", "date"], frame(company, 3, 10))
+
+        assert self.stored(company) == {date(2024, 1, 1): 10, date(2024, 1, 2): 11, date(2024, 1, 3): 12}
+
+    def test_empty_frame(self, company):
+        assert upsert_frame(CompanyHistory, FIELDS, ["company", "date"], frame(company, 0, 1)) == 0
@@ -0,0 +1,53 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+from stocks.models import CompanyHistory
+from stocks.utils import market_data
+from stocks.utils.get_historical_data import get_history
+
+
+@pytest.fixture
+def recorded(replay_provider, monkeypatch):
+    idx = pd.DatetimeIndex(["2024-01-01", "2024-01-02", "2024-01-03"], tz="Asia/Kolkata")
+    replay_provider.record(
+        "TEST.NS",
+        history=pd.DataFrame({"Close": [100.0, 101.5, 102.0], "Volume": [5, 10, 20]}, index=idx),
+    )
+
+    calls = []
+    history = market_data.ReplayProvider.history
+
+    def spy(self, symbol, start=None):
+        calls.append(start)
+        return history(self, symbol, start)
+
+    monkeypatch.setattr(market_data.ReplayProvider, "history", spy)
+    return calls
+
+
+@pytest.mark.django_db
+class TestHistorySync:
+
+    def test_first_sync_fetches_everything(self, company, recorded):
+        assert get_history(company) == 3
+
+        assert recorded == [None]
+        assert company.price_history.count() == 3
+
+    def test_fetches_only_missing_tail(self, company, recorded):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=99, volume=1)
+
+        assert get_history(company) == 2
+
+        assert recorded == [date(2024, 1, 2)]
+        # The overlapping day is overwritten with the fresh close
+        assert company.price_history.get(date=date(2024, 1, 2)).closing_price == pytest.approx(101.5)
+        assert company.price_history.count() == 2
+
+    def test_full_override(self, company, recorded):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=99, volume=1)
+
+        assert get_history(company, full=True) == 3
+
+        assert recorded == [None]
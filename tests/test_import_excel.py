@@ -0,0 +1,167 @@
+from datetime import datetime
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from stocks.models import Company, FinancialValue, ImportFingerprint, Metric, TimePeriod
+from stocks.utils.import_excel import (
+    import_data_sheet,
+    parse_data_sheet,
+    write_financial_values,
+)
+
+
+DATA_SHEET = [
+    ["META"],
+    ["Number of shares", 100],
+    ["PROFIT & LOSS"],
+    ["Report Date", datetime(2022, 3, 31), datetime(2023, 3, 31)],
+    ["Sales", 100, 200],
+    ["Net profit", 10, None],
+    ["QUARTERS"],
+    ["Report Date", datetime(2023, 6, 30), datetime(2024, 3, 31)],
+    ["Sales", 30, 40],
+    ["BALANCE SHEET"],
+    ["Report Date", datetime(2022, 3, 31), datetime(2023, 3, 31)],
+    ["Equity Share Capital", 50, 50],
+    ["Borrowings", 5, 6],
+    ["Total", 55, 56],
+    ["PRICE:", 1, 2],
+]
+
+
+def write_workbook(path, rows=DATA_SHEET):
+    wb = Workbook()
+    wb.active.title = "Data Sheet"
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+    return str(path)
+
+
+def stored(company):
+    return {
+        (fv.metric.code, fv.time_period.year, fv.time_period.quarter): float(fv.value)
+        for fv in FinancialValue.objects.filter(company=company).select_related("metric", "time_period")
+    }
+
+
+def test_parse_streams_typed_records(tmp_path):
+    rows = [
+        ["QUARTERS"],
+        ["Report Date", datetime(2023, 6, 30), "n/a", datetime(2023, 9, 30)],
+        ["Sales", 30, 99, "-"],
+        ["Expenses", 12.5],
+        ["RATIOS"],
+        ["Report Date", datetime(2023, 6, 30)],
+        ["ROE", 15],
+    ]
+    records = parse_data_sheet(write_workbook(tmp_path / "q.xlsx", rows))
+
+    assert [(r.section["report_type"], r.metric, r.period.month, r.value) for r in records] == [
+        ("quarterly", "Sales", 6, 30),
+        ("quarterly", "Expenses", 6, 12.5),
+    ]
+
+
+@pytest.mark.django_db
+class TestImportDataSheet:
+
+    def test_imports_statements(self, tmp_path):
+        company = import_data_sheet(write_workbook(tmp_path / "t.xlsx"), "NEWCO")
+
+        assert Company.objects.get(ticker="NEWCO") == company
+        assert stored(company) == {
+            ("SALES", 2022, None): 100,
+            ("SALES", 2023, None): 200,
+            ("NET_PROFIT", 2022, None): 10,
+            ("SALES", 2023, 1): 30,
+            ("SALES", 2023, 4): 40,
+            ("EQUITY_SHARE_CAPITAL", 2022, None): 50,
+            ("EQUITY_SHARE_CAPITAL", 2023, None): 50,
+            ("BORROWINGS", 2022, None): 5,
+            ("BORROWINGS", 2023, None): 6,
+        }
+        assert Metric.objects.get(code="BORROWINGS").category.code == "BS"
+
+    def test_reimport_updates_in_place(self, tmp_path, company):
+        import_data_sheet(write_workbook(tmp_path / "a.xlsx"), company.ticker)
+        rows = [list(r) for r in DATA_SHEET]
+        rows[4] = ["Sales", 100, 250]
+        import_data_sheet(write_workbook(tmp_path / "b.xlsx", rows), company.ticker)
+
+        assert stored(company)[("SALES", 2023, None)] == 250
+        assert FinancialValue.objects.filter(company=company).count() == 9
+        assert TimePeriod.objects.filter(period_type="annual", year=2023).count() == 1
+
+    def test_reimport_writes_only_changed_cells(self, tmp_path, company):
+        assert write_financial_values(company, parse_data_sheet(write_workbook(tmp_path / "a.xlsx"))) == 9
+        assert set(ImportFingerprint.objects.filter(company=company).values_list("section", flat=True)) == {
+            "pnl", "quarterly", "bs",
+        }
+
+        rows = [list(r) for r in DATA_SHEET]
+        rows[4] = ["Sales", 100, 250]
+        assert write_financial_values(company, parse_data_sheet(write_workbook(tmp_path / "b.xlsx", rows))) == 1
+
+    def test_unchanged_sections_are_skipped(self, tmp_path, company, django_assert_max_num_queries):
+        path = write_workbook(tmp_path / "a.xlsx")
+        write_financial_values(company, parse_data_sheet(path))
+
+        with django_assert_max_num_queries(1):
+            assert write_financial_values(company, parse_data_sheet(path)) == 0
+        assert write_financial_values(company, parse_data_sheet(path), force=True) == 0
+
+    def test_manual_edit_clears_fingerprints(self, tmp_path, company):
+        path = write_workbook(tmp_path / "a.xlsx")
+        write_financial_values(company, parse_data_sheet(path))
+        value = FinancialValue.objects.get(company=company, metric__code="BORROWINGS", time_period__year=2022)
+        value.value = 7
+        value.save()
+
+        assert not ImportFingerprint.objects.filter(company=company).exists()
+        assert write_financial_values(company, parse_data_sheet(path)) == 1
+        assert stored(company)[("BORROWINGS", 2022, None)] == 5
+
+    def test_cascaded_deletes_clear_fingerprints_once(self, tmp_path, company, other_company):
+        path = write_workbook(tmp_path / "a.xlsx")
+        write_financial_values(company, parse_data_sheet(path))
+        write_financial_values(other_company, parse_data_sheet(path))
+
+        Metric.objects.get(code="SALES").delete()
+        assert not ImportFingerprint.objects.exists()
+
+        # The cascade removes them with the company, not once per cell
+        with CaptureQueriesContext(connection) as queries:
+            company.delete()
+        assert sum("stocks_importfingerprint" in q["sql"] for q in queries) == 1
+
+    def test_query_count_independent_of_cells(self, tmp_path, company, django_assert_max_num_queries):
+        years = range(2000, 2024)
+        rows = [["PROFIT & LOSS"], ["Report Date", *[datetime(y, 3, 31) for y in years]]]
+        rows += [[f"Metric {i}", *[i for _ in years]] for i in range(40)]
+        path = write_workbook(tmp_path / "wide.xlsx", rows)
+
+        with django_assert_max_num_queries(30):
+            import_data_sheet(path, company.ticker)
+
+        assert FinancialValue.objects.filter(company=company).count() == 40 * len(years)
+
+
+@pytest.mark.django_db
+def test_bulk_import_command(tmp_path, company):
+    write_workbook(tmp_path / "TEST.xlsx")
+    write_workbook(tmp_path / "NEWCO.xlsx")
+    (tmp_path / "BROKEN.xlsx").write_text("not a workbook")
+    report = tmp_path / "report.csv"
+
+    call_command("import_financials", dir=str(tmp_path), workers=2, report=str(report))
+
+    assert FinancialValue.objects.filter(company=company).count() == 9
+    assert FinancialValue.objects.filter(company__ticker="NEWCO").count() == 9
+    assert not Company.objects.filter(ticker="BROKEN").exists()
+    lines = report.read_text().splitlines()
+    assert len(lines) == 4
+    assert any(line.startswith(str(tmp_path / "BROKEN.xlsx")) and ",failed," in line for line in lines)
@@ -0,0 +1,107 @@
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+from stocks.models import CompanyHistory, CompanyMarketSnapshot, FailedFetch
+from stocks.tasks import weekly_market_update
+from stocks.utils.market_data import MarketDataProvider, ReplayProvider
+from stocks.utils.marketsnapshot import get_live_snapshots, get_weekly_snapshots
+
+
+@pytest.fixture
+def recorded(replay_provider):
+    idx = pd.DatetimeIndex(["2024-02-29", "2024-03-01"])
+    replay_provider.record(
+        "TEST.NS",
+        history=pd.DataFrame({"Close": [120.0, 123.45], "Volume": [900, 1000]}, index=idx),
+        info={"marketCap": 5e9, "trailingPE": 18.5, "fiftyTwoWeekHigh": 150},
+    )
+    return replay_provider
+
+
+def test_replay_reads_csv(tmp_path):
+    (tmp_path / "history").mkdir()
+    (tmp_path / "history" / "X.NS.csv").write_text(
+        "Date,Close,Volume\n2024-01-01,1.0,1\n2024-01-02,,2\n"
+    )
+    (tmp_path / "info").mkdir()
+    (tmp_path / "info" / "X.NS.json").write_text(json.dumps({"trailingPE": 9}))
+    provider = ReplayProvider(tmp_path)
+
+    assert list(provider.history("X.NS", start=date(2024, 1, 2)).index.date) == [date(2024, 1, 2)]
+    # Last bar with a close wins
+    assert provider.latest_quotes(["X.NS", "MISSING.NS"]) == {"X.NS": (date(2024, 1, 1), 1.0, 1)}
+    assert provider.info("X.NS") == {"trailingPE": 9}
+
+
+def test_incomplete_provider_fails_on_creation():
+    class HistoryOnly(MarketDataProvider):
+        def history(self, symbol, start=None):
+            return pd.DataFrame()
+
+    with pytest.raises(TypeError):
+        HistoryOnly()
+
+
+@pytest.mark.django_db
+class TestBatchedSnapshots:
+
+    def test_bulk_upserts_and_reports_failures(self, recorded, company, other_company, django_assert_max_num_queries):
+        CompanyMarketSnapshot.objects.create(company=company, price=1, pe=20)
+
+        with django_assert_max_num_queries(4):
+            report = get_live_snapshots([company, other_company])
+
+        assert report == {"updated": ["TEST"], "failed": {"OTHER": "no data returned"}}
+        snapshot = CompanyMarketSnapshot.objects.get(company=company)
+        assert float(snapshot.price) == pytest.approx(123.45)
+        assert snapshot.pe == 20
+        history = CompanyHistory.objects.get(company=company)
+        assert (history.date, history.volume) == (date(2024, 3, 1), 1000)
+        assert not CompanyMarketSnapshot.objects.filter(company=other_company).exists()
+
+    def test_weekly_updates_from_info(self, recorded, company, company_market_snapshot):
+        assert get_weekly_snapshots([company]) == {"updated": ["TEST"], "failed": {}}
+
+        snapshot = CompanyMarketSnapshot.objects.get(company=company)
+        assert float(snapshot.pe) == 18.5
+        assert float(snapshot.high_52w) == 150
+
+    def test_weekly_values_that_do_not_fit_are_left_empty(self, recorded, company, other_company, company_market_snapshot):
+        recorded.record("OTHER.NS", info={"trailingPE": "Infinity", "priceToBook": 2.5e8, "marketCap": 1e6})
+        CompanyMarketSnapshot.objects.create(company=other_company, price=10, pe=12)
+
+        assert get_weekly_snapshots([company, other_company]) == {"updated": ["TEST", "OTHER"], "failed": {}}
+
+        other = CompanyMarketSnapshot.objects.get(company=other_company)
+        assert (other.pe, other.pb, other.market_cap) == (None, None, 1000000)
+        assert float(CompanyMarketSnapshot.objects.get(company=company).pe) == 18.5
+
+    @pytest.mark.parametrize("failures, attempts", [(1, None), (10, 4)])
+    def test_weekly_update_retries_only_failed_ticker(
+        self, recorded, company, other_company, company_market_snapshot, monkeypatch, failures, attempts,
+    ):
+        CompanyMarketSnapshot.objects.create(company=other_company, price=10)
+        calls = []
+        info = ReplayProvider.info
+
+        def flaky(self, symbol):
+            calls.append(symbol)
+            if symbol == "OTHER.NS" and calls.count(symbol) <= failures:
+                raise ConnectionError("timed out")
+            return info(self, symbol)
+
+        monkeypatch.setattr(ReplayProvider, "info", flaky)
+
+        weekly_market_update.delay()
+
+        assert calls.count("TEST.NS") == 1
+        assert float(CompanyMarketSnapshot.objects.get(company=company).pe) == 18.5
+        fetch = FailedFetch.objects.filter(kind="company_info").first()
+        if attempts is None:
+            assert calls.count("OTHER.NS") == 2
+            assert fetch is None
+        else:
+            assert calls.count("OTHER.NS") == attempts
+            assert (fetch.symbol, fetch.attempts) == ("OTHER.NS", attempts)
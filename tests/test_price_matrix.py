@@ -0,0 +1,141 @@
+from datetime import date
+
+import json
+
+import numpy as np
+import pytest
+from stocks.models import Company, CompanyHistory, Index, IndexCategory, IndexHistory
+from stocks.utils import price_matrix
+from stocks.utils.price_matrix import build_price_matrix, load_price_matrix
+
+
+@pytest.mark.django_db
+class TestPriceMatrix:
+
+    @pytest.fixture
+    def nifty(self, db):
+        category = IndexCategory.objects.create(code="BROAD", name="Broad Market")
+        return Index.objects.create(name="Nifty 50", ticker="NIFTY50", exchange="nse", category=category)
+
+    def test_full_build(self, tmp_path, company, other_company, nifty):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 1), closing_price=10, volume=100)
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=11, volume=200)
+        CompanyHistory.objects.create(company=other_company, date=date(2024, 1, 2), closing_price=50, volume=5)
+        IndexHistory.objects.create(index=nifty, date=date(2024, 1, 1), value=20000)
+
+        assert build_price_matrix(tmp_path) == 2
+        matrix = load_price_matrix(tmp_path)
+
+        assert list(matrix.dates.astype(str)) == ["2024-01-01", "2024-01-02"]
+        np.testing.assert_array_equal(matrix.prices("TEST"), [10, 11])
+        np.testing.assert_array_equal(matrix.prices("OTHER"), [np.nan, 50])
+        np.testing.assert_array_equal(matrix.volume[0], [100, 200])
+        np.testing.assert_array_equal(matrix.index_prices("NIFTY50"), [20000, np.nan])
+        np.testing.assert_allclose(matrix.returns()[0], [np.nan, 0.1])
+
+    def test_incremental_appends_new_days(self, tmp_path, company, other_company):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 1), closing_price=10, volume=1)
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=11, volume=1)
+        build_price_matrix(tmp_path)
+
+        # Last exported day is refreshed, later days appended
+        CompanyHistory.objects.filter(date=date(2024, 1, 2)).update(closing_price=12)
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 3), closing_price=13, volume=1)
+        CompanyHistory.objects.create(company=other_company, date=date(2024, 1, 3), closing_price=7, volume=1)
+
+        assert build_price_matrix(tmp_path) == 2
+        matrix = load_price_matrix(tmp_path)
+
+        np.testing.assert_array_equal(matrix.prices("TEST"), [10, 12, 13])
+        np.testing.assert_array_equal(matrix.prices("OTHER"), [np.nan, np.nan, 7])
+
+    def generation(self, path):
+        return json.loads((path / "meta.json").read_text())["generation"]
+
+    def test_removed_company_forces_rebuild(self, tmp_path, company, other_company):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 1), closing_price=10, volume=1)
+        build_price_matrix(tmp_path)
+        generation = self.generation(tmp_path)
+        other_company.delete()
+
+        assert build_price_matrix(tmp_path) == 1
+        assert load_price_matrix(tmp_path).tickers == ["TEST"]
+        assert self.generation(tmp_path) != generation
+
+    def test_new_company_fills_a_spare_row(self, tmp_path, company, nifty, monkeypatch):
+        monkeypatch.setattr(price_matrix, "RECHECK_DAYS", 1)
+        for day in range(1, 6):
+            CompanyHistory.objects.create(company=company, date=date(2024, 1, day), closing_price=day, volume=1)
+        build_price_matrix(tmp_path)
+        generation = self.generation(tmp_path)
+
+        late = Company.objects.create(name="Late", ticker="LATE", exchange="nse", sector="Tech")
+        CompanyHistory.objects.create(company=late, date=date(2024, 1, 2), closing_price=20, volume=1)
+        CompanyHistory.objects.create(company=late, date=date(2024, 1, 5), closing_price=50, volume=1)
+        category = IndexCategory.objects.get()
+        sensex = Index.objects.create(name="Sensex", ticker="SENSEX", exchange="bse", category=category)
+        IndexHistory.objects.create(index=sensex, date=date(2024, 1, 3), value=70000)
+
+        # Of the two days compared again only the last changed; LATE's older
+        # days are filled into its row without re-reading anyone else's
+        assert build_price_matrix(tmp_path) == 1
+        assert self.generation(tmp_path) == generation
+        matrix = load_price_matrix(tmp_path)
+        assert matrix.tickers == ["TEST", "LATE"]
+        np.testing.assert_array_equal(matrix.prices("LATE"), [np.nan, 20, np.nan, np.nan, 50])
+        np.testing.assert_array_equal(matrix.prices("TEST"), [1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(matrix.index_prices("SENSEX"), [np.nan, np.nan, 70000, np.nan, np.nan])
+
+    def test_new_company_with_unexported_days_forces_rebuild(self, tmp_path, company, monkeypatch):
+        monkeypatch.setattr(price_matrix, "RECHECK_DAYS", 1)
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 5), closing_price=5, volume=1)
+        build_price_matrix(tmp_path)
+        generation = self.generation(tmp_path)
+
+        late = Company.objects.create(name="Late", ticker="LATE", exchange="nse", sector="Tech")
+        CompanyHistory.objects.create(company=late, date=date(2024, 1, 1), closing_price=1, volume=1)
+
+        assert build_price_matrix(tmp_path) == 2
+        assert self.generation(tmp_path) != generation
+        np.testing.assert_array_equal(load_price_matrix(tmp_path).prices("LATE"), [1, np.nan])
+
+    def test_only_recent_days_are_compared_again(self, tmp_path, company, monkeypatch):
+        monkeypatch.setattr(price_matrix, "RECHECK_DAYS", 2)
+        for day in range(1, 6):
+            CompanyHistory.objects.create(company=company, date=date(2024, 1, day), closing_price=day, volume=1)
+        build_price_matrix(tmp_path)
+
+        CompanyHistory.objects.filter(date__in=[date(2024, 1, 1), date(2024, 1, 4)]).update(closing_price=9)
+
+        assert build_price_matrix(tmp_path) == 2
+        np.testing.assert_array_equal(load_price_matrix(tmp_path).prices("TEST"), [1, 2, 3, 9, 5])
+        # Older edits need a full rebuild
+        build_price_matrix(tmp_path, full=True)
+        np.testing.assert_array_equal(load_price_matrix(tmp_path).prices("TEST"), [9, 2, 3, 9, 5])
+
+    def test_incremental_picks_up_backfilled_days(self, tmp_path, company):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=11, volume=1)
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 3), closing_price=12, volume=1)
+        build_price_matrix(tmp_path)
+        assert build_price_matrix(tmp_path) == 0
+
+        # e.g. a retry pass filling a day missed during an outage
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 1), closing_price=10, volume=1)
+
+        assert build_price_matrix(tmp_path) == 3
+        matrix = load_price_matrix(tmp_path)
+        assert list(matrix.dates.astype(str)) == ["2024-01-01", "2024-01-02", "2024-01-03"]
+        np.testing.assert_array_equal(matrix.prices("TEST"), [10, 11, 12])
+
+    def test_full_rebuild_leaves_open_matrix_readable(self, tmp_path, company):
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 1), closing_price=10, volume=1)
+        build_price_matrix(tmp_path)
+        before = load_price_matrix(tmp_path)
+
+        CompanyHistory.objects.create(company=company, date=date(2024, 1, 2), closing_price=11, volume=1)
+        build_price_matrix(tmp_path, full=True)
+
+        np.testing.assert_array_equal(before.prices("TEST"), [10])
+        np.testing.assert_array_equal(load_price_matrix(tmp_path).prices("TEST"), [10, 11])
+        # Only the new generation's files are left
+        assert len(list(tmp_path.glob("*.f64"))) == 3
@@ -0,0 +1,56 @@
+import pytest
+from django.urls import reverse
+from stocks.utils.search_index import CompanySearchIndex, IndexedCompany
+
+
+@pytest.fixture
+def index():
+    return CompanySearchIndex([
+        IndexedCompany(1, "SBIN", "State Bank of India"),
+        IndexedCompany(2, "SBICARD", "SBI Cards and Payment Services"),
+        IndexedCompany(3, "TCS", "Tata Consultancy Services"),
+        IndexedCompany(4, "TATAMOTORS", "Tata Motors"),
+        IndexedCompany(5, "INFY", "Infosys"),
+        IndexedCompany(6, "HDFCBANK", "HDFC Bank"),
+    ])
+
+
+def tickers(results):
+    return [c.ticker for c in results]
+
+
+def test_exact_ticker_ranks_first(index):
+    assert tickers(index.search("tcs")) == ["TCS"]
+    assert tickers(index.search("SBI"))[:2] == ["SBIN", "SBICARD"]
+
+
+def test_name_token_prefix(index):
+    assert tickers(index.search("tata")) == ["TATAMOTORS", "TCS"]
+    assert tickers(index.search("state ba")) == ["SBIN"]
+    assert tickers(index.search("services")) == ["TCS", "SBICARD"]
+
+
+def test_substring_match(index):
+    assert tickers(index.search("bank")) == ["SBIN", "HDFCBANK"]
+    assert tickers(index.search("fcba")) == ["HDFCBANK"]
+
+
+def test_typo_tolerance(index):
+    assert tickers(index.search("infosis")) == ["INFY"]
+    assert tickers(index.search("motros")) == ["TATAMOTORS"]
+    assert index.search("zzzzzz") == []
+
+
+def test_limit(index):
+    assert len(index.search("s", limit=2)) == 2
+
+
+@pytest.mark.django_db
+def test_autocomplete_uses_index(client, company, django_assert_num_queries):
+    url = reverse("stock-autocomplete")
+    client.get(url, {"q": "TEST"})
+
+    with django_assert_num_queries(0):
+        response = client.get(url, {"q": "tset"})
+
+    assert company.ticker in response.content.decode()
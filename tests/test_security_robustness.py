@@ -74,12 +74,31 @@ class TestRobustness:
         assert response.status_code == 200
         content = response.content.decode()
         
-        # Check for metric name
-        assert metric.name in content
         if company_fundamental.revenue:
             # Simple check for 5,000
             assert "5,000" in content or "5000" in content
 
+        # Statements are loaded lazily from their own section endpoint
+        assert reverse("stock-section", args=[company.ticker, "pnl"]) in content
+        response = client.get(reverse("stock-section", args=[company.ticker, "pnl"]))
+
+        assert response.status_code == 200
+        # Check for metric name
+        assert metric.name in response.content.decode()
+
+    def test_stock_section_unknown(self, client, company):
+        url = reverse("stock-section", args=[company.ticker, "unknown"])
+        response = client.get(url)
+
+        assert response.status_code == 404
+
+    def test_stock_section_chart_without_history(self, client, company):
+        url = reverse("stock-section", args=[company.ticker, "chart"])
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert "No Data Available" in response.content.decode()
+
     def test_autocomplete_partial_match(self, client, company):
 
         url = reverse("stock-autocomplete")
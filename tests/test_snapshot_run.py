@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+from django.core.cache import cache
+from stocks import tasks
+from stocks.models import Index, IndexCategory, SnapshotRun
+from stocks.utils.company_cache import company_cache_key
+
+
+@pytest.fixture
+def recorded(replay_provider, settings, tmp_path, monkeypatch):
+    settings.PRICE_MATRIX_DIR = tmp_path / "matrix"
+    monkeypatch.setattr(tasks, "SNAPSHOT_BATCH_SIZE", 1)
+    frame = pd.DataFrame({"Close": [100.0], "Volume": [10]}, index=pd.DatetimeIndex(["2024-03-01"]))
+    replay_provider.record("TEST.NS", history=frame)
+    replay_provider.record("^NSEI", history=frame)
+    category = IndexCategory.objects.create(code="BROAD", name="Broad")
+    Index.objects.create(
+        name="Nifty 50", ticker="NIFTY50", exchange="nse", category=category,
+        metadata={"yahoo_symbol": "^NSEI"},
+    )
+    return replay_provider
+
+
+@pytest.mark.django_db
+def test_daily_snapshot_records_run_and_warms_pages(recorded, company, other_company, company_fundamental):
+    tasks.daily_market_snapshot.delay()
+
+    run = SnapshotRun.objects.get()
+    assert run.status == "finished"
+    assert run.chunks == 2
+    assert (run.companies_updated, run.companies_failed) == (1, 1)
+    assert (run.indices_updated, run.indices_failed) == (1, 0)
+    assert run.rows_written == 3
+    assert run.duration is not None
+    # Downstream steps ran once every chunk had reported
+    assert (recorded.root / "matrix").exists()
+    assert cache.get(company_cache_key(company.pk, "header")) is not None
+    assert cache.get(company_cache_key(other_company.pk, "header")) is None
+
+
+@pytest.mark.django_db
+def test_failed_chunk_marks_run_failed(company):
+    run = SnapshotRun.objects.create(chunks=1)
+
+    tasks.fail_snapshot_run(None, RuntimeError("worker lost"), None, run.pk)
+
+    run.refresh_from_db()
+    assert (run.status, run.error) == ("failed", "worker lost")
+    assert run.finished_at is not None
@@ -0,0 +1,44 @@
+import pytest
+from stocks.models import FinancialValue, Metric, MetricCategory, TimePeriod
+from stocks.utils.statements import get_company_statements, get_statement
+
+
+@pytest.mark.django_db
+class TestStatements:
+
+    def test_pivots_rows_in_period_order(self, company, metric, metric_category):
+        expenses = Metric.objects.create(code="EXPENSES", name="Expenses", category=metric_category)
+        p2022 = TimePeriod.objects.create(year=2022, period_type="annual")
+        p2023 = TimePeriod.objects.create(year=2023, period_type="annual")
+        FinancialValue.objects.create(company=company, metric=metric, time_period=p2023, value=200)
+        FinancialValue.objects.create(company=company, metric=metric, time_period=p2022, value=100)
+        FinancialValue.objects.create(company=company, metric=expenses, time_period=p2023, value=50)
+
+        periods, rows = get_statement(company, "pnl")
+
+        assert periods == [p2022, p2023]
+        assert [(row["metric"], row["values"]) for row in rows] == [
+            ("Sales", [100, 200]),
+            ("Expenses", [None, 50]),
+        ]
+
+    def test_all_statements_in_constant_queries(self, company, metric, django_assert_num_queries):
+        bs = MetricCategory.objects.get(code="BS")
+        borrowings = Metric.objects.create(code="BORROWINGS", name="Borrowings", category=bs)
+        for year in range(2010, 2024):
+            annual = TimePeriod.objects.create(year=year, period_type="annual")
+            FinancialValue.objects.create(company=company, metric=metric, time_period=annual, value=year)
+            FinancialValue.objects.create(company=company, metric=borrowings, time_period=annual, value=1)
+            for quarter in range(1, 5):
+                q = TimePeriod.objects.create(year=year, quarter=quarter, period_type="quarterly")
+                FinancialValue.objects.create(company=company, metric=metric, time_period=q, value=quarter)
+
+        with django_assert_num_queries(2):
+            statements = get_company_statements(company)
+
+        assert len(statements["quarterly"][0]) == 8
+        assert len(statements["pnl"][0]) == 12
+        assert statements["bs"][1] == [
+            {"metric": "Borrowings", "values": [1] * 12, "growth": [(None, None)] * 12},
+        ]
+        assert statements["cf"][1] == []
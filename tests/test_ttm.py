@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from stocks.models import FinancialValue, Metric, MetricCategory, TimePeriod
+from stocks.utils.ttm import compute_ttm, rolling_sums
+
+
+def test_rolling_sums_need_four_present_quarters():
+    values = np.array([[1, 2, 3, 4, 5, np.nan, 7, 8, 9, 10]], dtype=float)
+
+    out = rolling_sums(values)
+
+    np.testing.assert_array_equal(out[0, 3:5], [10, 14])
+    assert np.isnan(out[0, :3]).all() and np.isnan(out[0, 5:9]).all()
+    assert out[0, 9] == 34
+
+
+@pytest.mark.django_db
+class TestComputeTTM:
+
+    @pytest.fixture
+    def quarters(self, company, metric):
+        # FY2022 Q3 .. FY2023 Q4 with FY2023 Q2 missing
+        keys = [(2022, 3), (2022, 4), (2023, 1), (2023, 3), (2023, 4)]
+        for i, (year, quarter) in enumerate(keys):
+            period = TimePeriod.objects.create(year=year, quarter=quarter, period_type="quarterly")
+            FinancialValue.objects.create(company=company, metric=metric, time_period=period, value=10 * (i + 1))
+        return keys
+
+    def ttm(self, company):
+        return {
+            (fv.time_period.year, fv.time_period.quarter): fv.value
+            for fv in FinancialValue.objects.filter(company=company, time_period__period_type="ttm").select_related("time_period")
+        }
+
+    def test_windows_span_fiscal_years_but_not_gaps(self, company, metric, quarters):
+        period = TimePeriod.objects.create(year=2023, quarter=2, period_type="quarterly")
+        FinancialValue.objects.create(company=company, metric=metric, time_period=period, value=1)
+
+        assert compute_ttm() == 3
+
+        assert self.ttm(company) == {(2023, 2): 10 + 20 + 30 + 1, (2023, 3): 20 + 30 + 1 + 40, (2023, 4): 30 + 1 + 40 + 50}
+        assert str(TimePeriod.objects.get(period_type="ttm", year=2023, quarter=4)) == "TTM FY2023 Q4"
+
+    def test_gap_clears_stale_ttm(self, company, metric, quarters):
+        period = TimePeriod.objects.create(year=2023, quarter=2, period_type="quarterly")
+        value = FinancialValue.objects.create(company=company, metric=metric, time_period=period, value=1)
+        compute_ttm([company.pk])
+        value.delete()
+
+        compute_ttm([company.pk])
+
+        assert set(self.ttm(company).values()) == {None}
+
+    def test_only_flow_categories(self, company, quarters):
+        bs = Metric.objects.create(code="BORROWINGS", name="Borrowings", category=MetricCategory.objects.get(code="BS"))
+        for period in TimePeriod.objects.filter(period_type="quarterly"):
+            FinancialValue.objects.create(company=company, metric=bs, time_period=period, value=1)
+
+        compute_ttm()
+
+        assert not FinancialValue.objects.filter(metric=bs, time_period__period_type="ttm").exists()